@@ -3,24 +3,105 @@
 Network scanner to find OpenEVSE wallboxes by detecting Mongoose/6.18 server header.
 """
 
+import asyncio
+import functools
 import socket
 import ipaddress
-import requests
-import concurrent.futures
+import json
 import sys
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
-# Disable SSL warnings for self-signed certificates
-requests.packages.urllib3.disable_warnings()
+import aiohttp
 
-def get_local_network() -> Optional[ipaddress.IPv4Network]:
-    """Detect the local network range."""
+try:
+    import aiodns  # optional: enables reverse-zone pruning of wide scans
+except ImportError:
+    aiodns = None
+
+try:
+    import orjson  # optional: faster parsing of the /config JSON
+except ImportError:
+    orjson = None
+
+try:
+    import uvloop  # optional: libuv event loop, not available on Windows
+except ImportError:
+    uvloop = None
+
+json_loads = orjson.loads if orjson is not None else json.loads
+
+# Timeout for the /config lookup on confirmed devices
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=2)
+
+# TCP connect timeout for the HEAD probe; dead hosts are dropped after this
+TCP_PROBE_TIMEOUT = 0.3
+
+# Timeout for each response line of the HEAD probe once connected
+HEADER_TIMEOUT = 2.0
+
+# Seconds between progress line updates
+PROGRESS_INTERVAL = 0.25
+
+class AdaptiveLimiter:
+    """Concurrency window tuned by AIMD while the scan runs.
+    
+    The window doubles after every 100 completions without a timeout and is
+    halved when a connected host times out. Connect timeouts are not counted,
+    since on a sparse network they just mean nobody is home.
+    """
+    
+    GROWTH_INTERVAL = 100
+    BACKOFF_INTERVAL = 0.5  # seconds; a burst of timeouts only halves once
+    
+    def __init__(self, initial: int = 32, minimum: int = 8, maximum: int = 512):
+        self.limit = min(initial, maximum)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self._clean = 0
+        self._last_backoff = 0.0
+        self._cond = asyncio.Condition()
+    
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._cond:
+            self.in_flight -= 1
+            if exc_type is asyncio.TimeoutError:
+                self._on_timeout()
+            else:
+                self._clean += 1
+                if self._clean >= self.GROWTH_INTERVAL:
+                    self._clean = 0
+                    self.limit = min(self.maximum, self.limit * 2)
+            self._cond.notify_all()
+        return False
+    
+    def _on_timeout(self):
+        self._clean = 0
+        now = asyncio.get_running_loop().time()
+        if now - self._last_backoff >= self.BACKOFF_INTERVAL:
+            self._last_backoff = now
+            self.limit = max(self.minimum, self.limit // 2)
+
+def get_local_ip() -> str:
+    """Determine the local IP used for outbound traffic."""
+    # Create a socket to determine local IP
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     try:
-        # Create a socket to determine local IP
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         s.connect(("8.8.8.8", 80))
-        local_ip = s.getsockname()[0]
+        return s.getsockname()[0]
+    finally:
         s.close()
+
+def get_local_network() -> Optional[ipaddress.IPv4Network]:
+    """Detect the local network range."""
+    try:
+        local_ip = get_local_ip()
         
         # Assume /24 subnet
         network = ipaddress.IPv4Network(f"{local_ip}/24", strict=False)
@@ -29,82 +110,195 @@ def get_local_network() -> Optional[ipaddress.IPv4Network]:
         print(f"Error detecting local network: {e}")
         return None
 
-def get_hostname(ip: str) -> str:
+def reverse_zone(prefix: ipaddress.IPv4Network) -> str:
+    """Return the in-addr.arpa name covering a /8, /16 or /24 prefix."""
+    octets = str(prefix.network_address).split('.')[:prefix.prefixlen // 8]
+    return '.'.join(reversed(octets)) + '.in-addr.arpa'
+
+async def zone_has_hosts(resolver, prefix: ipaddress.IPv4Network) -> bool:
+    """Check whether the reverse zone of a prefix exists.
+    
+    Per RFC 8020 an NXDOMAIN answer means nothing exists below that name, so
+    the prefix holds no hosts with PTR records. Any other outcome (including
+    NODATA and resolver errors) is treated as "may have hosts".
+    """
+    # aiodns 4 renamed query() to query_dns()
+    query = getattr(resolver, 'query_dns', resolver.query)
+    try:
+        await query(reverse_zone(prefix), 'SOA')
+    except aiodns.error.DNSError as e:
+        return not (e.args and e.args[0] == aiodns.error.ARES_ENOTFOUND)
+    return True
+
+async def prune_empty_subnets(network: ipaddress.IPv4Network) -> List[ipaddress.IPv4Network]:
+    """Split a wide network into /24s and drop those whose reverse zone is NXDOMAIN."""
+    if network.prefixlen >= 24:
+        return [network]
+    subnets = list(network.subnets(new_prefix=24))
+    if aiodns is None:
+        return subnets
+    
+    resolver = aiodns.DNSResolver(timeout=1.0, tries=1)
+    try:
+        # Only trust NXDOMAIN answers if the resolver reports our own /24 as present;
+        # many home routers answer NXDOMAIN for every private reverse zone.
+        local_subnet = ipaddress.IPv4Network(f"{get_local_ip()}/24", strict=False)
+        if not await zone_has_hosts(resolver, local_subnet):
+            return subnets
+    except Exception:
+        return subnets
+    
+    present = await asyncio.gather(*(zone_has_hosts(resolver, subnet) for subnet in subnets))
+    kept = [subnet for subnet, has_hosts in zip(subnets, present) if has_hosts]
+    if len(kept) < len(subnets):
+        print(f"Skipping {len(subnets) - len(kept)} empty /24 subnet(s) (reverse zone NXDOMAIN)")
+    return kept
+
+async def get_hostname(session: aiohttp.ClientSession, ip: str) -> str:
     """Get hostname from OpenEVSE device config API."""
     try:
         # Try to get hostname from device's config endpoint
         url = f"http://{ip}/config"
-        response = requests.get(url, timeout=2, allow_redirects=False)
-        if response.status_code == 200:
-            config = response.json()
-            # Try different possible hostname fields
-            hostname = config.get('hostname') or config.get('device_name') or config.get('name')
-            if hostname:
-                return hostname
+        async with session.get(url, timeout=REQUEST_TIMEOUT, allow_redirects=False) as response:
+            if response.status == 200:
+                config = json_loads(await response.read())
+                # Try different possible hostname fields
+                hostname = config.get('hostname') or config.get('device_name') or config.get('name')
+                if hostname:
+                    return hostname
     except Exception:
         pass
     
-    # Fallback to reverse DNS lookup
+    # Fallback to reverse DNS lookup, off the event loop so other probes keep running
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, reverse_lookup, ip)
+
+@functools.lru_cache(maxsize=1024)
+def reverse_lookup(ip: str) -> str:
+    """Resolve an IP to a hostname via PTR lookup, caching hits and misses."""
     try:
         hostname, _, _ = socket.gethostbyaddr(ip)
         return hostname
     except (socket.herror, socket.gaierror, socket.timeout):
         return "(unknown)"
 
-def check_host(ip: str) -> Optional[dict]:
+async def probe_server(ip: str, port: int = 80) -> Optional[Tuple[int, str]]:
+    """Send a raw HEAD request and return (status, Server header) for Mongoose hosts.
+    
+    The connect uses the short TCP probe timeout so dead hosts are dropped after
+    one handshake attempt. Hosts answering with TLS bytes or a non-2xx status are
+    rejected from the status line; otherwise the response is read line by line
+    and the connection is closed as soon as the Server header is seen.
+    """
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), TCP_PROBE_TIMEOUT)
+    except Exception:
+        return None
+    try:
+        writer.write(b'HEAD / HTTP/1.0\r\nHost: ' + ip.encode() + b'\r\n\r\n')
+        await writer.drain()
+        try:
+            head = await asyncio.wait_for(reader.readexactly(5), HEADER_TIMEOUT)
+        except asyncio.IncompleteReadError:
+            return None
+        if head[0] in (0x15, 0x16) and head[1] == 0x03:
+            return None  # TLS record on port 80, never an OpenEVSE
+        status_line = head + await asyncio.wait_for(reader.readline(), HEADER_TIMEOUT)
+        parts = status_line.split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith(b'HTTP/') or not parts[1].isdigit():
+            return None
+        if not 200 <= int(parts[1]) < 300:
+            return None  # Mongoose answers / with 200; redirects are captive portals and the like
+        while True:
+            line = await asyncio.wait_for(reader.readline(), HEADER_TIMEOUT)
+            if not line.strip():
+                return None  # end of headers without a Server line
+            if line[:7].lower() == b'server:':
+                server = line[7:].strip()
+                if not server.startswith(b'Mongoose'):
+                    return None
+                return int(parts[1]), server.decode('latin-1')
+    finally:
+        writer.close()
+
+async def check_host(session: aiohttp.ClientSession, limiter: AdaptiveLimiter, ip: str) -> Optional[dict]:
     """Check if a host has Mongoose server on port 80."""
     try:
-        # Try HTTP request with short timeout
-        url = f"http://{ip}"
-        response = requests.head(url, timeout=2, allow_redirects=False)
-        
-        server_header = response.headers.get('Server', '')
-        
-        if 'Mongoose' in server_header:
-            hostname = get_hostname(ip)
+        async with limiter:
+            probe = await probe_server(ip)
+            if probe is None:
+                return None
+            status, server_header = probe
+            # Only confirmed devices are worth the full HTTP request for /config
+            hostname = await get_hostname(session, ip)
             return {
                 'ip': ip,
                 'hostname': hostname,
                 'server': server_header,
-                'status': response.status_code,
-                'headers': dict(response.headers)
+                'status': status
             }
-    except (requests.exceptions.RequestException, socket.timeout):
+    except (aiohttp.ClientError, asyncio.TimeoutError, socket.timeout):
         pass
     except Exception:
         pass
     
     return None
 
-def scan_network(network: ipaddress.IPv4Network, max_workers: int = 50) -> List[dict]:
+def ip_str(i: int) -> str:
+    """Format an integer IPv4 address as a dotted quad."""
+    return f"{(i >> 24) & 0xff}.{(i >> 16) & 0xff}.{(i >> 8) & 0xff}.{i & 0xff}"
+
+async def scan_network(network: ipaddress.IPv4Network, max_concurrency: int = 512) -> List[dict]:
     """Scan the network for OpenEVSE devices."""
     print(f"Scanning network {network} for OpenEVSE wallboxes...")
     print(f"This may take a minute...\n")
     
-    hosts = list(network.hosts())
+    if network.prefixlen >= 31:
+        ranges = [(int(ip), int(ip)) for ip in network.hosts()]
+    else:
+        # Only the outer network/broadcast addresses are excluded, not those of each /24
+        first = int(network.network_address) + 1
+        last = int(network.broadcast_address) - 1
+        ranges = [(max(first, int(subnet.network_address)), min(last, int(subnet.broadcast_address)))
+                  for subnet in await prune_empty_subnets(network)]
+    total = sum(end - start + 1 for start, end in ranges)
+    hosts = (ip_str(i) for start, end in ranges for i in range(start, end + 1))
     found_devices = []
+    completed = 0
     
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit all scan tasks
-        future_to_ip = {executor.submit(check_host, str(ip)): ip for ip in hosts}
+    # One event loop, one socket per in-flight host; the limiter adapts concurrency
+    limiter = AdaptiveLimiter(maximum=max_concurrency)
+    # Keep-alive pool: repeat requests to a device (e.g. a /config retry) reuse its socket
+    connector = aiohttp.TCPConnector(limit=max_concurrency, limit_per_host=4, keepalive_timeout=30,
+                                     ttl_dns_cache=300, ssl=False)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async def worker():
+            nonlocal completed
+            # Workers share the address generator, so no per-host task or object is kept around
+            for ip in hosts:
+                result = await check_host(session, limiter, ip)
+                completed += 1
+                if result:
+                    found_devices.append(result)
+                    hostname_info = f" ({result['hostname']})" if result['hostname'] != "(unknown)" else ""
+                    print(f"\n✓ Found OpenEVSE at {result['ip']}{hostname_info} - Server: {result['server']}")
+        
+        async def reporter():
+            # One writer for the progress line, at most four updates a second
+            while True:
+                print(f"Progress: {completed}/{total} hosts checked...", end='\r')
+                await asyncio.sleep(PROGRESS_INTERVAL)
         
-        # Process results as they complete
-        completed = 0
-        for future in concurrent.futures.as_completed(future_to_ip):
-            completed += 1
-            if completed % 25 == 0:
-                print(f"Progress: {completed}/{len(hosts)} hosts checked...", end='\r')
-            
-            result = future.result()
-            if result:
-                found_devices.append(result)
-                hostname_info = f" ({result['hostname']})" if result['hostname'] != "(unknown)" else ""
-                print(f"\n✓ Found OpenEVSE at {result['ip']}{hostname_info} - Server: {result['server']}")
-    
-    print(f"\nScan complete: checked {len(hosts)} hosts")
+        progress = asyncio.ensure_future(reporter())
+        try:
+            await asyncio.gather(*(worker() for _ in range(min(max_concurrency, total))))
+        finally:
+            progress.cancel()
+    
+    print(f"\nScan complete: checked {total} hosts")
     return found_devices
 
-def main():
+async def async_main():
     print("OpenEVSE Wallbox Network Scanner")
     print("=" * 50)
     
@@ -126,7 +320,7 @@ def main():
         print(f"Detected local network: {network}\n")
     
     # Scan the network
-    devices = scan_network(network)
+    devices = await scan_network(network)
     
     # Display results
     print("\n" + "=" * 50)
@@ -146,5 +340,11 @@ def main():
         print("  - Try specifying the network range manually")
         print("  - Verify port 80 is accessible (check firewall)")
 
+def main():
+    if uvloop is not None:
+        uvloop.run(async_main())
+    else:
+        asyncio.run(async_main())
+
 if __name__ == "__main__":
     main()
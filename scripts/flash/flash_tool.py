@@ -6,7 +6,7 @@ Replaces separate shell/batch scripts with a cross-platform Python CLI.
 Subcommands:
   esp     Flash ESP32 firmware (bin/elf + optional bootloader/partitions/fs)
   lgt     Flash LGT8F328P (Arduino-compatible AVR derivative) via avrdude
-  both    Flash ESP32 first, then LGT8F328P using one workflow
+  both    Flash ESP32 and LGT8F328P in one workflow (concurrently on two explicit ports)
 
 Key Features:
   * Autodetect firmware/hex files if not specified
@@ -17,7 +17,8 @@ Key Features:
 
 Dependencies:
   * esptool (for ESP32)
-  * pyserial (optional: only for user serial miniterm advice)
+  * pyserial (optional: serial port detection on all platforms)
+  * intelhex (optional: converts the LGT HEX to a raw image before avrdude)
   * avrdude (external executable) for LGT8F328P (must be installed separately)
 
 Examples:
@@ -29,6 +30,11 @@ Examples:
 """
 from __future__ import annotations
 import argparse
+import atexit
+import concurrent.futures
+import csv
+import functools
+import importlib.util
 import os
 import platform
 import shutil
@@ -36,43 +42,135 @@ import subprocess
 import sys
 from pathlib import Path
 import tempfile
-import re
+import select
+import signal
+import time
 
 # ------------------------------- Common Helpers ------------------------------
 
+# Seconds without child output before the child is killed (None: wait forever). POSIX only.
+CMD_IDLE_TIMEOUT: float | None = None
+
+
 def run_cmd(cmd: list[str] | str, check: bool = True):
-    print("[CMD]", cmd if isinstance(cmd, str) else " ".join(cmd))
-    if isinstance(cmd, str):
-        result = subprocess.run(cmd, shell=True)
-    else:
-        result = subprocess.run(cmd)
-    if check and result.returncode != 0:
-        print(f"[ERROR] Command failed with code {result.returncode}")
-        sys.exit(result.returncode)
-    return result.returncode
+    return wait_cmd(start_cmd(cmd), check)
+
+
+def start_cmd(cmd: list[str] | str) -> subprocess.Popen:
+    """Launch a command without waiting for it; pair with wait_cmd()."""
+    print("[CMD]", cmd if isinstance(cmd, str) else " ".join(cmd), flush=True)
+    if CMD_IDLE_TIMEOUT is None or os.name != 'posix':
+        return subprocess.Popen(cmd, shell=isinstance(cmd, str))
+    # Piped so output can be watched for stalls; own session so the whole group can be killed
+    return subprocess.Popen(cmd, shell=isinstance(cmd, str), stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            start_new_session=True, env={**os.environ, 'PYTHONUNBUFFERED': '1'})
+
+
+def stream_output(proc: subprocess.Popen, idle_timeout: float):
+    """Forward the child's piped output until EOF, killing it after idle_timeout seconds of silence."""
+    fd = proc.stdout.fileno()
+    last_output = time.monotonic()
+    while True:
+        ready, _, _ = select.select([fd], [], [], 0.1)
+        if ready:
+            chunk = os.read(fd, 4096)
+            if not chunk:
+                break
+            sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            last_output = time.monotonic()
+        elif time.monotonic() - last_output > idle_timeout:
+            print(f"\n[ERROR] No output for {idle_timeout:g}s; terminating command", flush=True)
+            stop_group(proc, signal.SIGTERM)
+            break
+    proc.stdout.close()
 
 
+def stop_group(proc: subprocess.Popen, sig: int):
+    """Send sig to the child's process group, then SIGKILL it if still running after 5s."""
+    for sig, timeout in ((sig, 5), (signal.SIGKILL, None)):
+        try:
+            os.killpg(proc.pid, sig)
+        except ProcessLookupError:
+            break
+        try:
+            proc.wait(timeout=timeout)
+            break
+        except subprocess.TimeoutExpired:
+            pass
+
+
+def wait_cmd(proc: subprocess.Popen, check: bool = True):
+    if proc.stdout is None:
+        returncode = proc.wait()
+    else:
+        try:
+            stream_output(proc, CMD_IDLE_TIMEOUT)
+            returncode = proc.wait()
+        except KeyboardInterrupt:
+            # The child has its own session, so the terminal's Ctrl-C never reached it
+            stop_group(proc, signal.SIGINT)
+            raise
+    if check and returncode != 0:
+        print(f"[ERROR] Command failed with code {returncode}")
+        sys.exit(returncode)
+    return returncode
+
+
+@functools.lru_cache(maxsize=None)
 def which(name: str) -> str | None:
+    # PATH (x PATHEXT on Windows) is walked once per name
     return shutil.which(name)
 
 
+# Marker returned by ensure_esptool() when esptool can be driven as a module
+ESPTOOL_IN_PROCESS = 'esptool'
+
+
+@functools.lru_cache(maxsize=None)
 def ensure_esptool() -> str:
-    # prefer esptool.py directly
+    # prefer running esptool in this interpreter: no process start-up per step.
+    # find_spec only locates the package; it is imported on first use in run_esptool
+    if importlib.util.find_spec('esptool') is not None:
+        return ESPTOOL_IN_PROCESS
     if which("esptool.py"):
         return "esptool.py"
+    print("[ERROR] esptool not installed.")
+    print("Hint: bootstrap and activate the local virtual environment:")
+    print("  python scripts/flash/flash_tool.py --bootstrap")
+    print("Then activate it:")
+    print("  Linux/macOS:   source .venv/bin/activate")
+    print("  Windows (cmd): .\\.venv\\Scripts\\activate.bat")
+    print("  Windows (PS):  .\\.venv\\Scripts\\Activate.ps1")
+    print("After activation, re-run this command.")
+    sys.exit(1)
+
+
+def esptool_argv(esptool_cmd: str, args: list[str]) -> list[str]:
+    """Full command line for running esptool with `args` as a child process."""
+    if esptool_cmd == ESPTOOL_IN_PROCESS:
+        return [sys.executable, '-m', 'esptool'] + args
+    return esptool_cmd.split() + args
+
+
+def run_esptool(esptool_cmd: str, args: list[str], check: bool = True):
+    if esptool_cmd != ESPTOOL_IN_PROCESS:
+        return run_cmd(esptool_argv(esptool_cmd, args), check)
+    import esptool
+    print("[CMD] esptool", " ".join(args))
     try:
-        subprocess.run([sys.executable, "-m", "esptool", "version"], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        return f"{sys.executable} -m esptool"
-    except Exception:
-        print("[ERROR] esptool not installed.")
-        print("Hint: bootstrap and activate the local virtual environment:")
-        print("  python scripts/flash/flash_tool.py --bootstrap")
-        print("Then activate it:")
-        print("  Linux/macOS:   source .venv/bin/activate")
-        print("  Windows (cmd): .\\.venv\\Scripts\\activate.bat")
-        print("  Windows (PS):  .\\.venv\\Scripts\\Activate.ps1")
-        print("After activation, re-run this command.")
-        sys.exit(1)
+        esptool.main(args)
+        returncode = 0
+    except SystemExit as e:
+        returncode = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except Exception as e:
+        # esptool raises FatalError (and serial errors) instead of exiting when used as a module
+        print(f"[ERROR] esptool: {e}")
+        returncode = 2
+    if check and returncode != 0:
+        print(f"[ERROR] Command failed with code {returncode}")
+        sys.exit(returncode)
+    return returncode
 
 
 def bootstrap_environment(force: bool = False):
@@ -88,9 +186,10 @@ def bootstrap_environment(force: bool = False):
     if not pip_path.exists():
         print('[ERROR] pip not found inside venv')
         sys.exit(1)
-    print('[+] Upgrading pip & installing dependencies (esptool pyserial)')
-    run_cmd([str(pip_path), 'install', '--upgrade', 'pip', 'setuptools', 'wheel'])
-    run_cmd([str(pip_path), 'install', '--upgrade', 'esptool', 'pyserial'])
+    print('[+] Upgrading pip & installing dependencies (esptool pyserial intelhex)')
+    # one resolver pass for the tooling and the tool deps; skip pip's self-update check
+    run_cmd([str(pip_path), 'install', '--upgrade', '--disable-pip-version-check',
+             'pip', 'setuptools', 'wheel', 'esptool', 'pyserial', 'intelhex'])
     print('[+] Bootstrap complete.')
     print('Activate the environment before flashing:')
     print('  Linux/macOS:   source .venv/bin/activate')
@@ -101,21 +200,38 @@ def bootstrap_environment(force: bool = False):
 
 # ------------------------------- Port Detection ------------------------------
 
+# Serial device name prefixes under /dev (Linux USB adapters, macOS callout devices)
+POSIX_PORT_PREFIXES = ('ttyUSB', 'ttyACM', 'cu.')
+
+@functools.lru_cache(maxsize=1)
 def detect_ports() -> list[str]:
+    try:
+        # pyserial enumerates devices in-process on every platform (no wmic/WMI start-up)
+        from serial.tools import list_ports
+        return sorted({p.device for p in list_ports.comports()})
+    except ImportError:
+        pass
     system = platform.system().lower()
     ports: list[str] = []
     if 'windows' in system:
         try:
-            out = subprocess.check_output(['wmic', 'path', 'Win32_SerialPort', 'get', 'DeviceID'], stderr=subprocess.DEVNULL).decode(errors='ignore')
-            ports = [l.strip() for l in out.splitlines() if l.strip().startswith('COM')]
+            # filter and project inside WMI instead of enumerating every serial row
+            out = subprocess.check_output(['wmic', 'path', 'Win32_SerialPort', 'where', "DeviceID like 'COM%'", 'get', 'DeviceID'], stderr=subprocess.DEVNULL).decode(errors='ignore')
+            # DeviceID header first, then one COMn per line
+            for line in out.splitlines():
+                line = line.strip()
+                if line.startswith('COM'):
+                    ports.append(line)
+                elif ports and line:
+                    break
         except Exception:
             ports = []
     else:
-        import glob
-        for pattern in ('/dev/ttyUSB*', '/dev/ttyACM*', '/dev/cu.usbserial*', '/dev/cu.*'):
-            for p in glob.glob(pattern):
-                if os.path.exists(p):
-                    ports.append(p)
+        try:
+            with os.scandir('/dev') as it:
+                ports = ['/dev/' + e.name for e in it if e.name.startswith(POSIX_PORT_PREFIXES)]
+        except OSError:
+            ports = []
     return sorted(set(ports))
 
 
@@ -148,17 +264,40 @@ def choose_port(provided: str | None, non_interactive: bool) -> str:
 ESP_APP_OFFSET = 0x10000
 ESP_BOOTLOADER_OFFSET = 0x1000
 ESP_PARTITIONS_OFFSET = 0x8000
+# Below this total payload write_flash sends the images uncompressed
+ESP_COMPRESS_MIN_BYTES = 64 * 1024
+# Images flashed alongside the app, never app candidates themselves
+COMPANION_IMAGES = frozenset(('bootloader.bin', 'partitions.bin', 'boot_app0.bin'))
+FLASH_MODES = ('qio', 'qout', 'dio', 'dout', 'keep')
+FLASH_FREQS = ('80m', '40m', '26m', '20m', 'keep')
 ESP_BOOT_APP0_OFFSET = 0xE000
-PARTITION_FS_PATTERN = re.compile(r"^(spiffs|littlefs),", re.IGNORECASE)
+# Partition names/subtypes that hold the filesystem image
+FS_PARTITION_NAMES = ('spiffs', 'littlefs')
 
 def autodetect_esp_firmware(non_interactive: bool, user: str | None) -> Path:
     if user:
         return Path(user)
     cwd = Path.cwd()
-    bin_candidates = sorted(cwd.glob('firmware*.bin')) or sorted(cwd.glob('*.bin'))
-    elf_candidates = sorted(cwd.glob('*.elf'))
-    # Filter out known non-app pieces
-    filtered = [c for c in (bin_candidates + elf_candidates) if c.name not in ('bootloader.bin','partitions.bin','boot_app0.bin')]
+    # One pass over the listing; known non-app pieces are skipped as we go
+    bins: list[str] = []
+    elfs: list[str] = []
+    for n in list_files(cwd):
+        if n.endswith('.bin') and n not in COMPANION_IMAGES:
+            bins.append(n)
+        elif n.endswith('.elf'):
+            elfs.append(n)
+    bins = [n for n in bins if n.startswith('firmware')] or bins
+    # An ELF and its same-stem .bin (left by convert_elf_to_bin) are one candidate:
+    # the .bin while it is fresh, else the ELF, which is then converted again.
+    # Done after the firmware* preference so a dropped .bin never lets other images in
+    for n in list(elfs):
+        sibling = n[:-len('.elf')] + '.bin'
+        if sibling in bins:
+            if fresh_sibling_bin(cwd / n) is not None:
+                elfs.remove(n)
+            else:
+                bins.remove(sibling)
+    filtered = [cwd / n for n in bins + elfs]
     if not filtered:
         if non_interactive:
             print('[ERROR] No firmware found and --file not specified.')
@@ -182,43 +321,92 @@ def autodetect_esp_firmware(non_interactive: bool, user: str | None) -> Path:
     return Path(sel)
 
 
+def list_files(directory: Path) -> list[str]:
+    """Names of the regular files in directory, from a single scandir pass."""
+    try:
+        with os.scandir(directory) as it:
+            return sorted(e.name for e in it if e.is_file())
+    except OSError:
+        return []
+
+
+def fresh_sibling_bin(elf: Path) -> Path | None:
+    """The .bin the build left next to elf, if it is at least as new as the ELF."""
+    sibling = elf.with_suffix('.bin')
+    try:
+        if sibling.stat().st_mtime_ns >= elf.stat().st_mtime_ns:
+            return sibling
+    except OSError:
+        pass
+    return None
+
+
 def convert_elf_to_bin(esptool_cmd: str, elf: Path) -> Path:
-    out_dir = Path(tempfile.mkdtemp(prefix='espconv_'))
-    out_base = out_dir / 'firmware'
-    cmd = f"{esptool_cmd} --chip esp32 elf2image -o {out_base} {elf}" if isinstance(esptool_cmd,str) else esptool_cmd
-    run_cmd(cmd)
-    bins = list(out_dir.glob('firmware*.bin'))
-    if not bins:
+    # Written beside the ELF: companion images there are found, and the next run reuses it
+    out = elf.with_suffix('.bin')
+    run_esptool(esptool_cmd, ['--chip', 'esp32', 'elf2image', '-o', str(out), str(elf)])
+    if not out.exists():
         print('[ERROR] elf2image produced no .bin')
         sys.exit(3)
-    primary = out_dir / 'firmware.bin'
-    return primary if primary.exists() else bins[0]
+    return out
 
 
 def parse_partitions_for_fs(csv_path: Path):
     try:
-        with csv_path.open('r', encoding='utf-8') as f:
-            for line in f:
-                line=line.strip()
-                if not line or line.startswith('#'): continue
-                parts=[c.strip() for c in line.split(',')]
-                if len(parts) < 5: continue
-                name, _type, _sub, offset, _size = parts[:5]
-                if PARTITION_FS_PATTERN.match(name):
-                    try: return int(offset,0)
-                    except ValueError: continue
-    except Exception:
+        st = csv_path.stat()
+    except OSError:
+        return None
+    return _parse_partitions_for_fs(str(csv_path.resolve()), st.st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=8)
+def _parse_partitions_for_fs(csv_path: str, _mtime_ns: int):
+    # keyed on mtime so an edited CSV is re-read
+    try:
+        with open(csv_path, newline='') as f:
+            for row in csv.reader(f, skipinitialspace=True):
+                if len(row) < 4 or row[0].lstrip().startswith('#'):
+                    continue
+                name, _type, subtype, offset = (c.strip() for c in row[:4])
+                if name.lower().startswith(FS_PARTITION_NAMES) or subtype.lower() in FS_PARTITION_NAMES:
+                    try:
+                        return int(offset, 0)
+                    except ValueError:
+                        return None  # offset left for the partition tool to assign
+    except OSError:
         return None
     return None
 
 
-def build_esp_flash_cmds(esptool_cmd: str, port: str, baud: int, mode: str, bootloader: Path|None, partitions: Path|None, boot_app0: Path|None, app_bin: Path, erase: bool, fs_image: Path|None, fs_offset: int|None) -> list[list[str]]:
-    base = esptool_cmd.split() if isinstance(esptool_cmd,str) else [esptool_cmd]
-    base += ['--chip','esp32','--port',port,'--baud',str(baud)]
+def esp_base_args(port: str, baud: int) -> list[str]:
+    return ['--chip','esp32','--port',port,'--baud',str(baud)]
+
+
+def esp_flash_params(flash_mode: str | None, flash_freq: str | None, flash_size: str | None) -> list[str]:
+    """write_flash SPI flash options; unset ones keep esptool's default (values in the image header)."""
+    params: list[str] = []
+    for opt, value in (('--flash_mode', flash_mode), ('--flash_freq', flash_freq), ('--flash_size', flash_size)):
+        if value:
+            params += [opt, value]
+    return params
+
+
+def build_esp_flash_cmds(port: str, baud: int, mode: str, bootloader: Path|None, partitions: Path|None, boot_app0: Path|None, app_bin: Path, erase: bool, fs_image: Path|None, fs_offset: int|None, flash_params: list[str] | None = None) -> list[list[str]]:
+    """esptool argument lists (without the program name) for each flash step."""
+    base = esp_base_args(port, baud)
     commands: list[list[str]] = []
+    images = [f for f in (bootloader if mode=='full' else None, partitions if mode=='full' else None,
+                          boot_app0 if mode=='full' else None, app_bin,
+                          fs_image if fs_offset is not None else None) if f]
+    # compression pays off once the UART transfer dominates the zlib setup on both ends;
+    # esptool compresses by default, so small payloads have to opt out explicitly
+    small = sum(f.stat().st_size for f in images) < ESP_COMPRESS_MIN_BYTES
+    flash = base + ['write_flash', '--no-compress' if small else '-z']
     if erase:
-        commands.append(base + ['erase_flash'])
-    flash = base + ['write_flash','-z']
+        # erase in the same session: one serial open and ROM sync instead of two
+        flash.append('--erase-all')
+    if flash_params:
+        flash += flash_params
     if mode=='full' and bootloader and partitions:
         flash += [f'0x{ESP_BOOTLOADER_OFFSET:05X}', str(bootloader), f'0x{ESP_PARTITIONS_OFFSET:05X}', str(partitions)]
         if boot_app0:
@@ -239,22 +427,27 @@ def flash_esp(args):
     port = choose_port(args.port, args.non_interactive)
     working_bin = firmware_path
     if firmware_path.suffix.lower()=='.elf':
-        print('[+] Converting ELF to BIN ...')
-        working_bin = convert_elf_to_bin(esptool_cmd, firmware_path)
-        print('[+] Generated BIN:', working_bin)
-    # Companion files
+        sibling = fresh_sibling_bin(firmware_path)
+        if sibling:
+            working_bin = sibling
+            print('[+] Using up-to-date BIN next to ELF:', working_bin)
+        else:
+            print('[+] Converting ELF to BIN ...')
+            working_bin = convert_elf_to_bin(esptool_cmd, firmware_path)
+            print('[+] Generated BIN:', working_bin)
+    # Companion files and FS image from one directory listing
     d = working_bin.parent
-    bootloader = (d/'bootloader.bin') if (d/'bootloader.bin').exists() else None
-    partitions = (d/'partitions.bin') if (d/'partitions.bin').exists() else None
-    boot_app0 = (d/'boot_app0.bin') if (d/'boot_app0.bin').exists() else None
+    names = list_files(d)
+    bootloader = (d/'bootloader.bin') if 'bootloader.bin' in names else None
+    partitions = (d/'partitions.bin') if 'partitions.bin' in names else None
+    boot_app0 = (d/'boot_app0.bin') if 'boot_app0.bin' in names else None
     mode = 'full' if bootloader and partitions and not args.no_full else 'app'
     # FS image
     fs_image = None; fs_offset=None
-    for pat in ('*spiffs*.bin','*littlefs*.bin'):
-        matches = list(d.glob(pat))
-        if matches:
-            fs_image = matches[0]
-            break
+    fs_matches = [n for n in names if n.lower().endswith('.bin') and ('spiffs' in n.lower() or 'littlefs' in n.lower())]
+    if fs_matches:
+        # spiffs images win over littlefs ones, as with the previous glob order
+        fs_image = d / min(fs_matches, key=lambda n: 'spiffs' not in n.lower())
     if args.filesystem:
         candidate = Path(args.filesystem)
         if candidate.exists(): fs_image = candidate
@@ -267,6 +460,7 @@ def flash_esp(args):
         if fs_offset is None:
             print('[WARN] Could not determine filesystem offset; skipping FS image')
             fs_image=None
+    flash_params = esp_flash_params(args.flash_mode, args.flash_freq, args.flash_size)
     print('\n=== ESP32 Flash Plan ===')
     print('Mode:', mode)
     print('Port:', port)
@@ -280,17 +474,20 @@ def flash_esp(args):
         print('FS Image   :', fs_image, '@', hex(fs_offset or 0))
     if args.erase:
         print('Erase flash: YES')
+    if flash_params:
+        print('Flash opts :', ' '.join(flash_params))
     if not args.non_interactive:
         cont=input('Proceed? [y/N]: ').strip().lower()
         if cont not in ('y','yes'):
             print('Aborted.')
             return
-    for c in build_esp_flash_cmds(esptool_cmd, port, args.baud, mode, bootloader, partitions, boot_app0, working_bin, args.erase, fs_image, fs_offset):
-        run_cmd(c)
+    for c in build_esp_flash_cmds(port, args.baud, mode, bootloader, partitions, boot_app0, working_bin, args.erase, fs_image, fs_offset, flash_params):
+        run_esptool(esptool_cmd, c)
     print('[+] ESP32 flash complete.')
 
 # ------------------------------- LGT Flashing --------------------------------
 
+@functools.lru_cache(maxsize=None)
 def which_avrdude() -> str:
     avrdude = which('avrdude')
     if not avrdude:
@@ -299,10 +496,35 @@ def which_avrdude() -> str:
     return avrdude
 
 
+def build_avrdude_cmd(avrdude: str, part: str, programmer: str, port: str, baud: int, u_ops: list[tuple[str, str, str, str]], extra: list[str] | None = None) -> list[str]:
+    """Assemble one avrdude invocation carrying every memory operation.
+
+    Each (memtype, op, value, fmt) tuple becomes a `-U memtype:op:value:fmt`
+    entry, so the bootloader handshake and signature read happen only once.
+    """
+    cmd = [avrdude, '-p', part, '-c', programmer, '-P', port, '-b', str(baud)]
+    for memtype, op, value, fmt in u_ops:
+        cmd += ['-U', f'{memtype}:{op}:{value}:{fmt}']
+    if extra:
+        cmd.extend(extra)
+    return cmd
+
+
+def parse_fuse_ops(fuses: list[str]) -> list[tuple[str, str, str, str]]:
+    ops = []
+    for f in fuses:
+        name, sep, value = f.partition('=')
+        if not sep or not name or not value:
+            print(f'[ERROR] Invalid --fuse value {f!r}; expected NAME=VALUE (e.g. lfuse=0xFF)')
+            sys.exit(2)
+        ops.append((name.strip(), 'w', value.strip(), 'm'))
+    return ops
+
+
 def autodetect_hex(non_interactive: bool, user: str | None) -> Path:
     if user:
         return Path(user)
-    detected = sorted(Path.cwd().glob('*.hex'))
+    detected = [Path.cwd() / n for n in list_files(Path.cwd()) if n.endswith('.hex')]
     if not detected:
         if non_interactive:
             print('[ERROR] No HEX file and --hex missing.')
@@ -326,20 +548,70 @@ def autodetect_hex(non_interactive: bool, user: str | None) -> Path:
     return Path(sel)
 
 
+def hex_to_raw(hex_file: Path) -> Path | None:
+    """Raw flash image for hex_file when intelhex is installed, else None."""
+    try:
+        st = hex_file.stat()
+    except OSError:
+        return None
+    return _hex_to_raw(str(hex_file.resolve()), st.st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=8)
+def _hex_to_raw(hex_path: str, _mtime_ns: int) -> Path | None:
+    # keyed on mtime so a rebuilt HEX is converted again
+    try:
+        from intelhex import IntelHex
+    except ImportError:
+        return None
+    try:
+        ih = IntelHex(hex_path)
+    except Exception as e:
+        print(f'[WARN] Could not parse {hex_path} ({e}); passing the HEX file to avrdude')
+        return None
+    if ih.minaddr() != 0:
+        # raw images are written from address 0
+        return None
+    fd, out = tempfile.mkstemp(prefix=Path(hex_path).stem + '_', suffix='.bin', dir=_conversion_dir())
+    os.close(fd)
+    ih.tobinfile(out)
+    return Path(out)
+
+
+@functools.lru_cache(maxsize=1)
+def _conversion_dir() -> str:
+    """One temp dir per process for converted images, removed at exit."""
+    path = tempfile.mkdtemp(prefix='lgtconv_')
+    atexit.register(shutil.rmtree, path, ignore_errors=True)
+    return path
+
+
 def flash_lgt(args):
     avrdude = which_avrdude()
     hex_file = autodetect_hex(args.non_interactive, args.hex)
     if not hex_file.exists():
         print('[ERROR] HEX file not found:', hex_file)
         sys.exit(2)
+    eeprom = Path(args.eeprom) if args.eeprom else None
+    if eeprom and not eeprom.exists():
+        print('[ERROR] EEPROM file not found:', eeprom)
+        sys.exit(2)
+    fuse_ops = parse_fuse_ops(args.fuse)
     port = choose_port(args.port, args.non_interactive)
-    cmd = [avrdude, '-p', args.part, '-c', args.programmer, '-P', port, '-b', str(args.baud), '-U', f'flash:w:{hex_file}:i']
-    if args.extra:
-        cmd.extend(args.extra)
+    raw = hex_to_raw(hex_file)
+    u_ops = [('flash', 'w', str(raw), 'r') if raw else ('flash', 'w', str(hex_file), 'i')]
+    if eeprom:
+        u_ops.append(('eeprom', 'w', str(eeprom), 'a'))
+    u_ops += fuse_ops
+    cmd = build_avrdude_cmd(avrdude, args.part, args.programmer, port, args.baud, u_ops, args.extra)
     print('\n=== LGT8F328P Flash Plan ===')
     print('Port:', port)
     print('Baud:', args.baud)
     print('HEX :', hex_file)
+    if eeprom:
+        print('EEPROM:', eeprom)
+    for memtype, _op, value, _fmt in fuse_ops:
+        print(f'Fuse: {memtype} = {value}')
     print('Part:', args.part)
     print('Prog:', args.programmer)
     if not args.non_interactive:
@@ -362,20 +634,33 @@ def flash_both(args):
         no_full=args.esp_no_full,
         filesystem=args.esp_filesystem,
         partitions_csv=args.esp_partitions_csv,
+        flash_mode=args.esp_flash_mode,
+        flash_freq=args.esp_flash_freq,
+        flash_size=args.esp_flash_size,
         chip='esp32',
         non_interactive=args.non_interactive
     )
-    flash_esp(esp_args)
     lgt_args = argparse.Namespace(
         hex=args.lgt_hex,
         port=args.lgt_port,
         baud=args.lgt_baud,
         programmer=args.lgt_programmer,
         part=args.lgt_part,
+        eeprom=args.lgt_eeprom,
+        fuse=args.lgt_fuse,
         extra=args.lgt_extra,
         non_interactive=args.non_interactive
     )
-    flash_lgt(lgt_args)
+    if not (args.non_interactive and args.esp_port and args.lgt_port and args.esp_port != args.lgt_port):
+        # prompts or a shared/auto-detected port: keep the ESP-then-LGT order
+        flash_esp(esp_args)
+        flash_lgt(lgt_args)
+        return
+    # Two chips on two known ports with nothing to confirm: run both transfers at once
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(flash_esp, esp_args), pool.submit(flash_lgt, lgt_args)]
+        for future in concurrent.futures.as_completed(futures):
+            future.result()  # re-raises SystemExit from a failed step
 
 # ------------------------------- Argument Parsing ----------------------------
 
@@ -384,6 +669,7 @@ def build_parser():
     p.add_argument('--bootstrap', action='store_true', help='Create/upgrade local .venv and install core deps (esptool, pyserial). Exits after completion.')
     p.add_argument('--force-bootstrap', action='store_true', help='Recreate .venv from scratch before bootstrapping')
     p.add_argument('--non-interactive', '-y', action='store_true', help='Fail instead of prompting for choices')
+    p.add_argument('--idle-timeout', type=float, metavar='SECONDS', help='Kill external commands (avrdude, pip, esptool.py when not importable) that print nothing for this long; in-process esptool is not covered (POSIX only)')
     sub = p.add_subparsers(dest='command', required=False)
 
     # ESP subcommand
@@ -395,6 +681,9 @@ def build_parser():
     pe.add_argument('--no-full', action='store_true', help='Do not flash bootloader/partitions even if present')
     pe.add_argument('--filesystem')
     pe.add_argument('--partitions-csv')
+    pe.add_argument('--flash-mode', choices=FLASH_MODES, help='SPI flash mode written to the image header (default: keep)')
+    pe.add_argument('--flash-freq', choices=FLASH_FREQS, help='SPI flash frequency (default: keep)')
+    pe.add_argument('--flash-size', help='Flash size, e.g. 4MB or detect (default: keep)')
 
     # LGT subcommand
     pl = sub.add_parser('lgt', help='Flash LGT8F328P (avrdude)')
@@ -403,6 +692,8 @@ def build_parser():
     pl.add_argument('--baud','-b', type=int, default=115200)
     pl.add_argument('--programmer','-P', default='avrisp')
     pl.add_argument('--part', default='lgt8f328p')
+    pl.add_argument('--eeprom', help='EEPROM image to write in the same avrdude session')
+    pl.add_argument('--fuse', action='append', default=[], metavar='NAME=VALUE', help='Fuse to write in the same avrdude session (e.g. lfuse=0xFF); repeatable')
     pl.add_argument('--extra', nargs='*', default=[])
 
     # BOTH subcommand
@@ -414,11 +705,16 @@ def build_parser():
     pb.add_argument('--esp-no-full', action='store_true')
     pb.add_argument('--esp-filesystem')
     pb.add_argument('--esp-partitions-csv')
+    pb.add_argument('--esp-flash-mode', choices=FLASH_MODES)
+    pb.add_argument('--esp-flash-freq', choices=FLASH_FREQS)
+    pb.add_argument('--esp-flash-size')
     pb.add_argument('--lgt-hex')
     pb.add_argument('--lgt-port')
     pb.add_argument('--lgt-baud', type=int, default=115200)
     pb.add_argument('--lgt-programmer', default='avrisp')
     pb.add_argument('--lgt-part', default='lgt8f328p')
+    pb.add_argument('--lgt-eeprom')
+    pb.add_argument('--lgt-fuse', action='append', default=[], metavar='NAME=VALUE')
     pb.add_argument('--lgt-extra', nargs='*', default=[])
 
     return p
@@ -427,6 +723,8 @@ def build_parser():
 def main():
     parser = build_parser()
     args = parser.parse_args()
+    global CMD_IDLE_TIMEOUT
+    CMD_IDLE_TIMEOUT = args.idle_timeout
     if args.bootstrap:
         bootstrap_environment(force=args.force_bootstrap)
         return
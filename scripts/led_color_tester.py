@@ -9,18 +9,75 @@ Usage:
     python3 led_color_tester.py [--port PORT]
 
 Then open your browser at: http://localhost:8000
+
+With aiohttp installed the server runs on asyncio, so a slow wallbox does not
+hold up other requests; otherwise the standard library server is used.
+
+The iro.js color picker is inlined into the page from iro.min.js next to this
+script or from ~/.cache/openevse (downloaded there on first start), so later
+runs work without internet access.
 """
 
+import asyncio
+import concurrent.futures
+import gzip
+import hashlib
+import http.client
 import http.server
-import socketserver
 import argparse
+import functools
+import ipaddress
 import json
-import urllib.request
+import os
+import socket
+import threading
+import time
 import urllib.error
-from urllib.parse import urlparse, parse_qs
+import urllib.request
+from pathlib import Path
+from urllib.parse import urlparse, urlsplit, parse_qs
+
+try:
+    import aiohttp
+    from aiohttp import web
+except ImportError:
+    aiohttp = None
+
+try:
+    import orjson  # optional: faster JSON for the proxied LED requests
+except ImportError:
+    orjson = None
 
 PORT = 8000
 
+json_loads = orjson.loads if orjson is not None else json.loads
+
+
+def json_dumps(obj) -> bytes:
+    """Serialize obj to UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode('utf-8')
+
+# Timeout for requests forwarded to the wallbox
+WALLBOX_TIMEOUT = 5
+
+# Seconds a resolved wallbox address is reused
+DNS_TTL = 60
+
+# Largest accepted LED request body; real ones are well under 200 bytes
+MAX_BODY = 8192
+
+# Seconds a browser connection may stall before its handler thread gives up
+CLIENT_TIMEOUT = 2
+
+# Upstream requests of one batched LED POST that run at the same time
+BATCH_WORKERS = 8
+
+# Returned when the wallbox accepted the connection but no usable response came back
+# (flagged so the page does not take it as the wallbox confirming the change)
+UNAVAILABLE_RESPONSE = json_dumps({"msg": "Request sent (response unavailable)", "unavailable": True})
+
 # Using raw string to avoid escaping issues
 HTML_CONTENT = r"""<!DOCTYPE html>
 <html lang="en">
@@ -469,6 +526,33 @@ HTML_CONTENT = r"""<!DOCTYPE html>
         const httpCommandDiv = document.getElementById('httpCommand');
         const mqttCommandDiv = document.getElementById('mqttCommand');
         
+        // Live updates: only the last change per LED state of a burst (e.g. a wheel
+        // drag) is sent, and all states touched in the burst go out as one batch
+        const LIVE_DEBOUNCE_MS = 100;
+        let liveTimer = null;
+        let inFlight = null;  // {controller, payloads} of the request still running
+        const pendingLive = new Map();  // hostname|state -> payload changed in this burst
+        const appliedKeys = new Map();  // hostname|state -> payload key the wallbox confirmed
+        function scheduleLive() {
+            if (!liveUpdateCheckbox.checked) {
+                return;
+            }
+            const payload = currentPayload();
+            pendingLive.set(slotKey(payload), payload);
+            clearTimeout(liveTimer);
+            liveTimer = setTimeout(flushLive, LIVE_DEBOUNCE_MS);
+        }
+        
+        function flushLive() {
+            // Changes that land back on what the wallbox already shows are skipped
+            const payloads = [...pendingLive.values()].filter(
+                p => payloadKey(p) !== appliedKeys.get(slotKey(p)));
+            pendingLive.clear();
+            if (payloads.length) {
+                sendPayloads(payloads);
+            }
+        }
+        
         // Initialize iro.js color picker
         const colorPicker = new iro.ColorPicker('#colorPicker', {
             width: 280,
@@ -498,33 +582,25 @@ HTML_CONTENT = r"""<!DOCTYPE html>
             
             updateCommandDisplay();
             
-            if (liveUpdateCheckbox.checked) {
-                applyColor();
-            }
+            scheduleLive();
         });
         
         // Update brightness display
         brightnessSlider.addEventListener('input', (e) => {
             brightnessValue.textContent = e.target.value;
             updateCommandDisplay();
-            if (liveUpdateCheckbox.checked) {
-                applyColor();
-            }
+            scheduleLive();
         });
         
         // State and timeout changes
         document.getElementById('state').addEventListener('change', () => {
             updateCommandDisplay();
-            if (liveUpdateCheckbox.checked) {
-                applyColor();
-            }
+            scheduleLive();
         });
         
         document.getElementById('timeout').addEventListener('change', () => {
             updateCommandDisplay();
-            if (liveUpdateCheckbox.checked) {
-                applyColor();
-            }
+            scheduleLive();
         });
         
         // Hostname changes
@@ -582,25 +658,46 @@ HTML_CONTENT = r"""<!DOCTYPE html>
             mqttCommandDiv.textContent = mqttCmd;
         }
         
-        async function applyColor() {
-            const hostname = document.getElementById('hostname').value;
-            const state = document.getElementById('state').value;
-            const color = colorPicker.color.hexString;
-            const brightness = parseInt(brightnessSlider.value);
-            const timeout = parseInt(document.getElementById('timeout').value);
-            
-            if (!hostname) {
+        function currentPayload() {
+            return {
+                hostname: document.getElementById('hostname').value,
+                state: document.getElementById('state').value,
+                color: colorPicker.color.hexString,
+                brightness: parseInt(brightnessSlider.value),
+                timeout: parseInt(document.getElementById('timeout').value)
+            };
+        }
+        
+        function slotKey(payload) {
+            return `${payload.hostname}|${payload.state}`;
+        }
+        
+        function payloadKey(payload) {
+            return [payload.hostname, payload.state, payload.color, payload.brightness, payload.timeout].join('|');
+        }
+        
+        function applyColor() {
+            const payload = currentPayload();
+            pendingLive.delete(slotKey(payload));
+            sendPayloads([payload]);
+        }
+        
+        async function sendPayloads(payloads) {
+            if (!payloads[0].hostname) {
                 showStatus('Please enter a hostname or IP address', 'error');
                 return;
             }
             
-            const payload = {
-                hostname: hostname,
-                state: state,
-                color: color,
-                brightness: brightness,
-                timeout: timeout
-            };
+            // A newer request supersedes the one in flight; states only the old one
+            // carried are sent again with it so they are not lost to the abort
+            if (inFlight) {
+                const slots = new Set(payloads.map(slotKey));
+                payloads = inFlight.payloads.filter(p => !slots.has(slotKey(p))).concat(payloads);
+                inFlight.controller.abort();
+            }
+            const controller = new AbortController();
+            inFlight = {controller, payloads};
+            payloads.forEach(p => appliedKeys.delete(slotKey(p)));  // unknown until this request completes
             
             try {
                 const response = await fetch('/api/led', {
@@ -608,14 +705,31 @@ HTML_CONTENT = r"""<!DOCTYPE html>
                     headers: {
                         'Content-Type': 'application/json',
                     },
-                    body: JSON.stringify(payload)
+                    body: JSON.stringify(payloads.length === 1 ? payloads[0] : payloads),
+                    signal: controller.signal
                 });
                 
                 const result = await response.json();
-                showStatus(`✓ Color applied: ${color} @ ${brightness}`, 'success');
+                if (inFlight && inFlight.controller === controller) {
+                    // Only bodies the wallbox itself sent confirm a payload
+                    const bodies = Array.isArray(result) ? result : [result];
+                    payloads.forEach((p, i) => {
+                        if (response.ok && bodies[i] && !bodies[i].unavailable) {
+                            appliedKeys.set(slotKey(p), payloadKey(p));
+                        }
+                    });
+                }
+                const last = payloads[payloads.length - 1];
+                showStatus(`✓ Color applied: ${last.color} @ ${last.brightness}`, 'success');
                 
             } catch (error) {
-                showStatus(`Error: ${error.message}`, 'error');
+                if (error.name !== 'AbortError') {
+                    showStatus(`Error: ${error.message}`, 'error');
+                }
+            } finally {
+                if (inFlight && inFlight.controller === controller) {
+                    inFlight = null;
+                }
             }
         }
         
@@ -627,6 +741,7 @@ HTML_CONTENT = r"""<!DOCTYPE html>
                 return;
             }
             
+            appliedKeys.clear();
             try {
                 const response = await fetch(`/api/led?hostname=${encodeURIComponent(hostname)}`, {
                     method: 'DELETE'
@@ -661,62 +776,265 @@ HTML_CONTENT = r"""<!DOCTYPE html>
 """
 
 
+IRO_JS_TAG = '<script src="https://cdn.jsdelivr.net/npm/@jaames/iro@5"></script>'
+IRO_JS_URL = 'https://cdn.jsdelivr.net/npm/@jaames/iro@5/dist/iro.min.js'
+# Local copies of iro.js, checked in order; the download is saved to the second one
+IRO_JS_PATHS = (
+    Path(__file__).with_name('iro.min.js'),
+    Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / 'openevse' / 'iro.min.js',
+)
+
+
+def load_iro_js():
+    """iro.js source from a local copy, fetched once into the cache; None if unavailable."""
+    for path in IRO_JS_PATHS:
+        try:
+            return path.read_text(encoding='utf-8')
+        except OSError:
+            pass
+    try:
+        with urllib.request.urlopen(IRO_JS_URL, timeout=3) as response:
+            source = response.read().decode('utf-8')
+    except (OSError, UnicodeDecodeError):
+        return None
+    try:
+        IRO_JS_PATHS[-1].parent.mkdir(parents=True, exist_ok=True)
+        IRO_JS_PATHS[-1].write_text(source, encoding='utf-8')
+    except OSError:
+        pass
+    return source
+
+
+def inline_iro_js(html: str, source: str) -> str:
+    """Replace the CDN script tag with the library source, so the page is one request."""
+    # a literal "</script" inside the source would end the inline block early
+    return html.replace(IRO_JS_TAG, '<script>' + source.replace('</script', '<\\/script') + '</script>')
+
+
+def build_page(html: str):
+    """(body, headers) for the plain and gzipped page; each gets its own strong ETag."""
+    plain = html.encode('utf-8')
+    digest = hashlib.sha256(plain).hexdigest()[:16]
+    cache_headers = {'Cache-Control': 'public, max-age=3600', 'Vary': 'Accept-Encoding'}
+    return ((plain, {'ETag': f'"{digest}"', **cache_headers}),
+            (gzip.compress(plain, compresslevel=9, mtime=0),
+             {'ETag': f'"{digest}-gz"', **cache_headers, 'Content-Encoding': 'gzip'}))
+
+
+# The page never changes while the server runs: encode, compress and tag it once.
+# main() rebuilds it with iro.js inlined when a copy is available.
+HTML_PLAIN, HTML_GZIPPED = build_page(HTML_CONTENT)
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Whether an Accept-Encoding header value allows gzip."""
+    for item in accept_encoding.split(','):
+        coding, _, params = item.partition(';')
+        if coding.strip().lower() in ('gzip', 'x-gzip'):
+            q = params.replace(' ', '').lower()
+            if not q.startswith('q='):
+                return True
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return False
+    return False
+
+
+def html_variant(accept_encoding: str):
+    """The (body, headers) pair of the page to send for an Accept-Encoding value."""
+    return HTML_GZIPPED if accepts_gzip(accept_encoding) else HTML_PLAIN
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Whether an If-None-Match header value covers etag."""
+    tags = [t.strip() for t in if_none_match.split(',')]
+    return '*' in tags or etag in tags or f"W/{etag}" in tags
+
+
+def not_modified_headers(headers: dict) -> dict:
+    """Validator headers to repeat on a 304 response."""
+    return {k: v for k, v in headers.items() if k != 'Content-Encoding'}
+
+
+@functools.lru_cache(maxsize=128)
+def led_url(hostname: str) -> str:
+    """URL of the wallbox LED endpoint for a hostname, IP or base URL.
+    
+    Every LED change is one POST to this endpoint, including state "all": the
+    firmware keeps that as its own override slot, so there is nothing to fan out.
+    """
+    if hostname.startswith(('http://', 'https://')):
+        return f"{hostname}/led"
+    return f"http://{hostname}/led"
+
+
+# Kept-alive wallbox connections, one set per server thread
+_connections = threading.local()
+
+# hostname -> (address, expiry); mDNS names like openevse.local are slow to resolve
+_dns_cache = {}
+
+
+def resolve_host(hostname: str) -> str:
+    """Address for hostname, cached for DNS_TTL seconds."""
+    try:
+        ipaddress.ip_address(hostname)
+        return hostname
+    except ValueError:
+        pass
+    now = time.monotonic()
+    entry = _dns_cache.get(hostname)
+    if entry and entry[1] > now:
+        return entry[0]
+    address = socket.getaddrinfo(hostname, None, type=socket.SOCK_STREAM)[0][4][0]
+    _dns_cache[hostname] = (address, now + DNS_TTL)
+    return address
+
+
+def wallbox_request(method: str, url: str, body: bytes = None, headers: dict = None) -> bytes:
+    """Send a request to the wallbox over a kept-alive connection and return the body.
+    
+    Raises OSError (urllib.error.HTTPError for error statuses) or
+    http.client.HTTPException when no usable response comes back.
+    """
+    parts = urlsplit(url)
+    key = (parts.scheme, parts.netloc)
+    pool = getattr(_connections, 'pool', None)
+    if pool is None:
+        pool = _connections.pool = {}
+    path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+    while True:
+        conn = pool.get(key)
+        fresh = conn is None
+        if fresh:
+            if parts.scheme == 'https':
+                conn = http.client.HTTPSConnection(parts.netloc, timeout=WALLBOX_TIMEOUT)
+            else:
+                # Connect to the cached address; the Host header keeps the name
+                conn = http.client.HTTPConnection(resolve_host(parts.hostname), parts.port or 80, timeout=WALLBOX_TIMEOUT)
+            pool[key] = conn
+        try:
+            conn.request(method, path, body=body, headers={'Host': parts.netloc, **(headers or {})})
+            response = conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            del pool[key]
+            if fresh:
+                _dns_cache.pop(parts.hostname, None)  # the wallbox may have a new address
+                raise
+            continue  # the wallbox dropped the idle socket; retry once on a new one
+        if response.will_close:
+            conn.close()
+            del pool[key]
+        if response.status >= 400:
+            raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, None)
+        return data
+
+
+def led_payloads(data):
+    """LED payloads of a request body, a single object or a JSON array of them.
+    
+    Returns None when any of them is not an object, lacks a string hostname or
+    has a non-scalar state (the state keys the aiohttp coalescer).
+    """
+    items = data if isinstance(data, list) else [data]
+    if items and all(isinstance(item, dict) and isinstance(item.get('hostname'), str) and item['hostname']
+                     and not isinstance(item.get('state'), (list, dict))
+                     for item in items):
+        return items
+    return None
+
+
+def batch_body(bodies) -> bytes:
+    """JSON array of the wallbox responses to a batch, in request order."""
+    return b'[' + b','.join(bodies) + b']'
+
+
+# Long-lived workers, so each keeps its wallbox connection between batches
+_batch_executor = concurrent.futures.ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='led-batch')
+
+
+def forward_led(data: dict) -> bytes:
+    """POST one LED payload to its wallbox and return the response body."""
+    url = led_url(data.pop('hostname'))
+    try:
+        return wallbox_request('POST', url, body=json_dumps(data), headers={'Content-Type': 'application/json'})
+    except (OSError, http.client.HTTPException):
+        return UNAVAILABLE_RESPONSE
+
+
 class LEDColorTesterHandler(http.server.SimpleHTTPRequestHandler):
     """Custom HTTP request handler for LED color tester"""
     
+    timeout = CLIENT_TIMEOUT  # applied to the client socket, bounds slow bodies
+    INDEX_PATHS = frozenset(('/', '/index.html'))
+    JSON_HEADERS = (('Content-type', 'application/json'), ('Access-Control-Allow-Origin', '*'))
+    
+    def _send_json(self, body: bytes):
+        """Send a 200 JSON response the browser may read cross-origin."""
+        self.send_response(200)
+        for name, value in self.JSON_HEADERS:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
     def do_GET(self):
         """Serve the HTML interface"""
-        if self.path == '/' or self.path == '/index.html':
+        if self.path in self.INDEX_PATHS:
+            body, headers = html_variant(self.headers.get('Accept-Encoding', ''))
+            if etag_matches(self.headers.get('If-None-Match', ''), headers['ETag']):
+                self.send_response(304)
+                for name, value in not_modified_headers(headers).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                return
             self.send_response(200)
-            self.send_header('Content-type', 'text/html')
+            self.send_header('Content-type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in headers.items():
+                self.send_header(name, value)
             self.end_headers()
-            self.wfile.write(HTML_CONTENT.encode('utf-8'))
+            self.wfile.write(body)
         else:
             self.send_error(404, "File not found")
     
     def do_POST(self):
         """Proxy POST requests to wallbox"""
         if self.path == '/api/led':
-            content_length = int(self.headers['Content-Length'])
+            try:
+                content_length = int(self.headers.get('Content-Length', ''))
+                if content_length < 0:
+                    raise ValueError(content_length)
+            except ValueError:
+                # Also covers chunked bodies, which carry no Content-Length
+                self.send_error(411, "Content-Length required")
+                return
+            if content_length > MAX_BODY:
+                self.send_error(413, "Request body too large")
+                return
             post_data = self.rfile.read(content_length)
             
             try:
-                data = json.loads(post_data.decode('utf-8'))
-                hostname = data.get('hostname')
-                
-                if not hostname:
-                    self.send_error(400, "Missing hostname")
+                try:
+                    data = json_loads(post_data)
+                except ValueError:
+                    self.send_error(400, "Invalid JSON")
                     return
+                items = led_payloads(data)
                 
-                # Remove hostname from payload
-                del data['hostname']
-                
-                # Forward request to wallbox
-                url = f"http://{hostname}/led"
-                if hostname.startswith('http://') or hostname.startswith('https://'):
-                    url = f"{hostname}/led"
-                
-                req = urllib.request.Request(
-                    url,
-                    data=json.dumps(data).encode('utf-8'),
-                    headers={'Content-Type': 'application/json'},
-                    method='POST'
-                )
+                if items is None:
+                    self.send_error(400, "Missing hostname or invalid LED payload")
+                    return
                 
-                with urllib.request.urlopen(req, timeout=5) as response:
-                    response_data = response.read()
-                    self.send_response(200)
-                    self.send_header('Content-type', 'application/json')
-                    self.send_header('Access-Control-Allow-Origin', '*')
-                    self.end_headers()
-                    self.wfile.write(response_data)
+                # Forward request to wallbox; the payloads of a batch go out concurrently
+                if isinstance(data, list):
+                    self._send_json(batch_body(_batch_executor.map(forward_led, items)))
+                else:
+                    self._send_json(forward_led(data))
                     
-            except urllib.error.URLError as e:
-                self.send_response(200)
-                self.send_header('Content-type', 'application/json')
-                self.send_header('Access-Control-Allow-Origin', '*')
-                self.end_headers()
-                self.wfile.write(json.dumps({"msg": "Request sent (response unavailable)"}).encode('utf-8'))
             except Exception as e:
                 self.send_error(500, str(e))
         else:
@@ -736,26 +1054,13 @@ class LEDColorTesterHandler(http.server.SimpleHTTPRequestHandler):
             
             try:
                 # Forward DELETE request to wallbox
-                url = f"http://{hostname}/led"
-                if hostname.startswith('http://') or hostname.startswith('https://'):
-                    url = f"{hostname}/led"
+                url = led_url(hostname)
                 
-                req = urllib.request.Request(url, method='DELETE')
-                
-                with urllib.request.urlopen(req, timeout=5) as response:
-                    response_data = response.read()
-                    self.send_response(200)
-                    self.send_header('Content-type', 'application/json')
-                    self.send_header('Access-Control-Allow-Origin', '*')
-                    self.end_headers()
-                    self.wfile.write(response_data)
+                response_data = wallbox_request('DELETE', url)
+                self._send_json(response_data)
                     
-            except urllib.error.URLError as e:
-                self.send_response(200)
-                self.send_header('Content-type', 'application/json')
-                self.send_header('Access-Control-Allow-Origin', '*')
-                self.end_headers()
-                self.wfile.write(json.dumps({"msg": "Request sent (response unavailable)"}).encode('utf-8'))
+            except (OSError, http.client.HTTPException):
+                self._send_json(UNAVAILABLE_RESPONSE)
             except Exception as e:
                 self.send_error(500, str(e))
         else:
@@ -766,6 +1071,139 @@ class LEDColorTesterHandler(http.server.SimpleHTTPRequestHandler):
         print(f"[{self.log_date_time_string()}] {format % args}")
 
 
+# ------------------------------- aiohttp server ------------------------------
+
+async def index(request):
+    """Serve the HTML interface"""
+    body, headers = html_variant(request.headers.get('Accept-Encoding', ''))
+    if etag_matches(request.headers.get('If-None-Match', ''), headers['ETag']):
+        return web.Response(status=304, headers=not_modified_headers(headers))
+    return web.Response(body=body, content_type='text/html', charset='utf-8', headers=headers)
+
+
+async def post_led(request):
+    """Proxy POST requests to wallbox"""
+    if (request.content_length or 0) > MAX_BODY:
+        raise web.HTTPRequestEntityTooLarge(MAX_BODY, request.content_length)
+    try:
+        data = json_loads(await asyncio.wait_for(request.read(), CLIENT_TIMEOUT))
+    except asyncio.TimeoutError:
+        raise web.HTTPRequestTimeout()
+    except ValueError:
+        raise web.HTTPBadRequest(text="Invalid JSON")
+    items = led_payloads(data)
+    if items is None:
+        raise web.HTTPBadRequest(text="Missing hostname or invalid LED payload")
+    # Bursts for the same wallbox and LED state collapse into one upstream POST;
+    # the payloads of a batch are forwarded concurrently
+    coalescer = request.app['coalescer']
+    bodies = await asyncio.gather(*(
+        coalescer.submit(led_url(item.pop('hostname')), item.get('state'), json_dumps(item))
+        for item in items
+    ))
+    return wallbox_response(batch_body(bodies) if isinstance(data, list) else bodies[0])
+
+
+async def delete_led(request):
+    """Proxy DELETE requests to wallbox"""
+    hostname = request.query.get('hostname')
+    if not hostname:
+        raise web.HTTPBadRequest(text="Missing hostname parameter")
+    return await forward_to_wallbox(request.app['session'], 'DELETE', led_url(hostname))
+
+
+async def forward_to_wallbox(session, method: str, url: str, **kwargs):
+    """Send one request to the wallbox and relay its body as JSON."""
+    return wallbox_response(await wallbox_call(session, method, url, **kwargs))
+
+
+async def wallbox_call(session, method: str, url: str, **kwargs) -> bytes:
+    """Send one request to the wallbox and return its body (or the unavailable message)."""
+    try:
+        async with session.request(method, url, **kwargs) as response:
+            # Error replies count as unavailable, as in the stdlib server
+            response.raise_for_status()
+            return await response.read()
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return UNAVAILABLE_RESPONSE
+
+
+def wallbox_response(body: bytes):
+    return web.Response(body=body, content_type='application/json',
+                        headers={'Access-Control-Allow-Origin': '*'})
+
+
+class LiveUpdateCoalescer:
+    """Collapse LED POSTs that arrive within a short window into one upstream request.
+    
+    Requests are keyed by (url, state); only the newest payload of a window is
+    sent, and every request of that window gets the wallbox's response.
+    """
+    
+    WINDOW = 0.05  # seconds
+    
+    def __init__(self, session):
+        self.session = session
+        self._pending = {}  # (url, state) -> [payload, [futures]]
+    
+    async def submit(self, url: str, state, payload: bytes) -> bytes:
+        future = asyncio.get_running_loop().create_future()
+        key = (url, state)
+        entry = self._pending.get(key)
+        if entry is None:
+            self._pending[key] = [payload, [future]]
+            asyncio.ensure_future(self._flush(key))
+        else:
+            entry[0] = payload
+            entry[1].append(future)
+        return await future
+    
+    async def _flush(self, key):
+        await asyncio.sleep(self.WINDOW)
+        payload, futures = self._pending.pop(key)
+        body = await wallbox_call(self.session, 'POST', key[0], data=payload,
+                                  headers={'Content-Type': 'application/json'})
+        for future in futures:
+            if not future.done():
+                future.set_result(body)
+
+
+async def start_session(app):
+    # Keep-alive pool: rapid live updates reuse the wallbox connection
+    connector = aiohttp.TCPConnector(limit_per_host=8, keepalive_timeout=30, ttl_dns_cache=DNS_TTL)
+    app['session'] = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=WALLBOX_TIMEOUT))
+    app['coalescer'] = LiveUpdateCoalescer(app['session'])
+
+
+async def close_session(app):
+    await app['session'].close()
+
+
+def create_app():
+    app = web.Application(client_max_size=MAX_BODY)
+    app.add_routes([
+        web.get('/', index),
+        web.get('/index.html', index),
+        web.post('/api/led', post_led),
+        web.delete('/api/led', delete_led),
+    ])
+    app.on_startup.append(start_session)
+    app.on_cleanup.append(close_session)
+    return app
+
+
+def print_banner(port: int):
+    print("=" * 60)
+    print("OpenEVSE LED Color Tester")
+    print("=" * 60)
+    print(f"\n✓ Server started on port {port}")
+    print(f"\n🌐 Open your browser at:")
+    print(f"   http://localhost:{port}")
+    print(f"   http://127.0.0.1:{port}")
+    print(f"\n💡 Make sure your wallbox is accessible on your network")
+    print(f"\nPress Ctrl+C to stop the server\n")
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='OpenEVSE LED Color Tester - Web Interface',
@@ -787,18 +1225,23 @@ Then open your browser at: http://localhost:8000
     
     args = parser.parse_args()
     
+    global HTML_PLAIN, HTML_GZIPPED
+    iro_js = load_iro_js()
+    if iro_js is not None:
+        HTML_PLAIN, HTML_GZIPPED = build_page(inline_iro_js(HTML_CONTENT, iro_js))
+    else:
+        print("Note: iro.js not cached locally; the page loads it from the CDN")
+    
     try:
-        with socketserver.TCPServer(("", args.port), LEDColorTesterHandler) as httpd:
-            print("=" * 60)
-            print("OpenEVSE LED Color Tester")
-            print("=" * 60)
-            print(f"\n✓ Server started on port {args.port}")
-            print(f"\n🌐 Open your browser at:")
-            print(f"   http://localhost:{args.port}")
-            print(f"   http://127.0.0.1:{args.port}")
-            print(f"\n💡 Make sure your wallbox is accessible on your network")
-            print(f"\nPress Ctrl+C to stop the server\n")
-            
+        if aiohttp is not None:
+            # run_app calls print once the socket is bound
+            web.run_app(create_app(), port=args.port, print=lambda _msg: print_banner(args.port))
+            print("\n\n✓ Server stopped")
+            return 0
+        # One thread per request: a slow wallbox only blocks the request waiting on it
+        with http.server.ThreadingHTTPServer(("", args.port), LEDColorTesterHandler) as httpd:
+            httpd.daemon_threads = True
+            print_banner(args.port)
             httpd.serve_forever()
             
     except KeyboardInterrupt:
@@ -12,13 +12,19 @@ Typical usage:
 Notes:
 - Default frame separation is based on inactivity of 20 ms (configurable via --gap-ms)
 - If you wired the USB adapters the other way around, just swap the --tx and --rx arguments
+- On a busy Linux host, --cpu N and --realtime (root) keep scheduling jitter out of the gap timing
 - Requires: pip install pyserial
 """
 from __future__ import annotations
 
 import argparse
-import datetime as dt
+import functools
+import math
+import os
+import queue
+import selectors
 import signal
+import struct
 import sys
 import threading
 import time
@@ -31,24 +37,52 @@ except Exception:
     raise
 
 
+def _crc16_table() -> tuple:
+    """CRC of every single byte value under poly 0xA001, starting from 0."""
+    table = []
+    for b in range(256):
+        crc = b
+        for _ in range(8):
+            if crc & 0x0001:
+                crc = (crc >> 1) ^ 0xA001
+            else:
+                crc >>= 1
+        table.append(crc)
+    return tuple(table)
+
+
+_CRC16_TABLE = _crc16_table()
+
+# RTU frame layout: [slave][function][data...][CRC lo][CRC hi]
+_HEADER = struct.Struct("<BB")
+_CRC = struct.Struct("<H")
+
+
 def crc16_modbus(data: bytes) -> int:
     """Compute Modbus RTU CRC-16 (poly 0xA001, initial 0xFFFF). Returns 16-bit integer.
     The CRC is appended little-endian in Modbus (low byte first, then high byte).
     """
+    table = _CRC16_TABLE
     crc = 0xFFFF
     for b in data:
-        crc ^= b
-        for _ in range(8):
-            if crc & 0x0001:
-                crc = (crc >> 1) ^ 0xA001
-            else:
-                crc >>= 1
-    return crc & 0xFFFF
+        crc = (crc >> 8) ^ table[(crc ^ b) & 0xFF]
+    return crc
+
+
+@functools.lru_cache(maxsize=1)
+def _local_hms(second: int) -> str:
+    t = time.localtime(second)
+    return f"{t.tm_hour:02d}:{t.tm_min:02d}:{t.tm_sec:02d}"
 
 
 def format_ts(ts: float) -> str:
-    t = dt.datetime.fromtimestamp(ts)
-    return t.strftime("%H:%M:%S.%f")[:-3]  # millisecond resolution
+    # Rounded to microseconds first, as datetime.fromtimestamp does
+    frac, second = math.modf(ts)
+    us = round(frac * 1e6)
+    if us >= 1_000_000:
+        second += 1
+        us -= 1_000_000
+    return f"{_local_hms(int(second))}.{us // 1000:03d}"  # millisecond resolution
 
 
 class Ansi:
@@ -63,90 +97,142 @@ class Ansi:
 print_lock = threading.Lock()
 stop_event = threading.Event()
 
+# Longest wait for data while no frame is pending, so a stop request is noticed
+IDLE_WAIT_S = 0.2
+
+# Most bytes taken from a port per wakeup; more than a Modbus frame, rest comes next loop
+READ_CHUNK = 4096
+
+# SCHED_FIFO priority used with --realtime (1-99; kept low to not starve the kernel's own threads)
+REALTIME_PRIORITY = 10
+
+
+_PARITY = {'N': serial.PARITY_NONE, 'E': serial.PARITY_EVEN, 'O': serial.PARITY_ODD}
+_STOPBITS = {1: serial.STOPBITS_ONE, 2: serial.STOPBITS_TWO}
+_BYTESIZE = {7: serial.SEVENBITS, 8: serial.EIGHTBITS}
+
 
 def _serial_parity(par: str):
-    par = par.upper()
-    if par == 'N':
-        return serial.PARITY_NONE
-    if par == 'E':
-        return serial.PARITY_EVEN
-    if par == 'O':
-        return serial.PARITY_ODD
-    raise ValueError("Unsupported parity, use one of: N, E, O")
+    try:
+        return _PARITY[par.upper()]
+    except KeyError:
+        raise ValueError("Unsupported parity, use one of: N, E, O") from None
 
 
 def _serial_stopbits(sb: int):
-    if sb == 1:
-        return serial.STOPBITS_ONE
-    if sb == 2:
-        return serial.STOPBITS_TWO
-    raise ValueError("Unsupported stopbits, use 1 or 2")
+    try:
+        return _STOPBITS[sb]
+    except KeyError:
+        raise ValueError("Unsupported stopbits, use 1 or 2") from None
 
 
 def _serial_bytesize(bs: int):
-    if bs == 7:
-        return serial.SEVENBITS
-    if bs == 8:
-        return serial.EIGHTBITS
-    raise ValueError("Unsupported bytesize, use 7 or 8")
+    try:
+        return _BYTESIZE[bs]
+    except KeyError:
+        raise ValueError("Unsupported bytesize, use 7 or 8") from None
 
 
 class FramePrinter:
+    """Formats captured frames and writes them to stdout from its own thread.
+
+    print_frame only queues the frame, so capture never waits on the terminal.
+    The writer emits everything queued in the meantime (up to BATCH_MAX rows)
+    with a single write and flush.
+    """
+
+    BATCH_MAX = 32
+
     def __init__(self):
         self._header_printed = False
+        # Colored, padded Dir column for TX (True) and RX (False) rows
+        self._dir_cols = {
+            True: f"{Ansi.TX}{'TX':<3}{Ansi.RESET}",
+            False: f"{Ansi.RX}{'RX':<3}{Ansi.RESET}",
+        }
+        self._queue = queue.SimpleQueue()
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
 
     def print_frame(self, label: str, is_tx: bool, timestamp: float, data: bytes):
         if not data:
             return
-        # Print table header once
+        # Copied: the sniffer reuses its buffer as soon as this returns
+        self._queue.put((is_tx, timestamp, bytes(data)))
+
+    def close(self):
+        """Write out every queued frame and stop the writer thread."""
+        self._queue.put(None)
+        self._writer.join()
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            batch = []
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self.BATCH_MAX or self._queue.empty():
+                    break
+                item = self._queue.get_nowait()
+            if batch:
+                self._write_rows([self._format_row(*frame) for frame in batch])
+            if item is None:
+                return
+
+    def _write_rows(self, rows: list[str]):
         with print_lock:
+            # Print table header once
             if not self._header_printed:
                 header = "Time                Dir  Slave Func CRC    Check Data"
-                print(header)
-                print("-" * len(header))
+                rows[:0] = [header, "-" * len(header)]
                 self._header_printed = True
-        # Parse Modbus RTU fields: [slave][function][data...][CRC lo][CRC hi]
-        slave_str = "--"
-        func_str = "--"
-        data_str = ""
-        crc_str = ""
-        crc_info = ""
-
-        if len(data) >= 1:
-            slave_str = f"0x{data[0]:02X}"
-        if len(data) >= 2:
-            func_str = f"0x{data[1]:02X}"
+            sys.stdout.write("\n".join(rows) + "\n")
+            sys.stdout.flush()
 
+    def _format_row(self, is_tx: bool, timestamp: float, data: bytes) -> str:
         if len(data) >= 4:
-            payload = data[2:-2]
-            crc_lo = data[-2]
-            crc_hi = data[-1]
-            given_crc = crc_lo | (crc_hi << 8)  # little-endian: low then high
-            calc_crc = crc16_modbus(data[:-2])
-            data_str = " ".join(f"{b:02X}" for b in payload) if payload else "-"
-            crc_str = f"{crc_lo:02X} {crc_hi:02X}"
-            if calc_crc == given_crc:
-                crc_info = "OK"
-            else:
-                crc_info = f"BAD({calc_crc:04X}/{given_crc:04X})"
+            slave_str, func_str, crc_str, crc_info, data_str = _full_frame_fields(data)
         else:
-            # No full frame; show whatever is available as data and mark CRC as missing
-            payload = data[2:] if len(data) > 2 else b""
-            data_str = " ".join(f"{b:02X}" for b in payload) if payload else "-"
-            crc_str = "--"
-            crc_info = "--"
-
-        color = Ansi.TX if is_tx else Ansi.RX
-        dir_col = "TX" if is_tx else "RX"
-        with print_lock:
-            # Tabular row: Time Dir Slave Func CRC Check Data
-            print(
-                f"{format_ts(timestamp)}  {color}{dir_col:<3}{Ansi.RESET} {slave_str:<5} {func_str:<5} {crc_str:<6} {crc_info:<6} {data_str}"
-            )
-            sys.stdout.flush()
+            slave_str, func_str, crc_str, crc_info, data_str = _short_frame_fields(data)
+        # Tabular row: Time Dir Slave Func CRC Check Data
+        return f"{format_ts(timestamp)}  {self._dir_cols[is_tx]} {slave_str:<5} {func_str:<5} {crc_str:<6} {crc_info:<6} {data_str}"
+
+
+def _full_frame_fields(data: bytes) -> tuple:
+    """Slave, function, CRC, check and data columns of a frame of 4+ bytes."""
+    # Parse Modbus RTU fields: [slave][function][data...][CRC lo][CRC hi]
+    slave, func = _HEADER.unpack_from(data)
+    payload = data[2:-2]
+    # An intact frame gives CRC 0 over all of its bytes, CRC included
+    if crc16_modbus(data) == 0:
+        crc_info = "OK"
+    else:
+        (given_crc,) = _CRC.unpack_from(data, len(data) - 2)  # little-endian: low then high
+        crc_info = f"BAD({crc16_modbus(data[:-2]):04X}/{given_crc:04X})"
+    return (
+        f"0x{slave:02X}",
+        f"0x{func:02X}",
+        data[-2:].hex(" ").upper(),
+        crc_info,
+        payload.hex(" ").upper() if payload else "-",
+    )
+
 
+def _short_frame_fields(data: bytes) -> tuple:
+    """Columns of a 1-3 byte fragment: whatever is there as data, CRC marked missing."""
+    payload = data[2:]
+    return (
+        f"0x{data[0]:02X}",
+        f"0x{data[1]:02X}" if len(data) >= 2 else "--",
+        "--",
+        "--",
+        payload.hex(" ").upper() if payload else "-",
+    )
+
+
+class SerialSniffer:
+    """Capture state for one serial port: the open port and the frame being assembled."""
 
-class SerialSniffer(threading.Thread):
     def __init__(
         self,
         port: str,
@@ -159,7 +245,6 @@ class SerialSniffer(threading.Thread):
         frame_timeout_s: float,
         printer: Optional[FramePrinter] = None,
     ):
-        super().__init__(daemon=True)
         self.port = port
         self.label = label
         self.is_tx = is_tx
@@ -169,12 +254,14 @@ class SerialSniffer(threading.Thread):
         self.bytesize = bytesize
         self.frame_timeout_s = frame_timeout_s if frame_timeout_s > 0 else 0.02
         self.printer = printer or FramePrinter()
+        self.ser = None
+        self._fd = None
         self._buf = bytearray()
         self._last_byte_ts = 0.0
 
-    def run(self):
+    def open(self) -> bool:
         try:
-            ser = serial.Serial(
+            self.ser = serial.Serial(
                 port=self.port,
                 baudrate=self.baudrate,
                 parity=_serial_parity(self.parity),
@@ -189,7 +276,7 @@ class SerialSniffer(threading.Thread):
             with print_lock:
                 print(f"{Ansi.ERR}Failed to open {self.port}: {e}{Ansi.RESET}", file=sys.stderr)
                 sys.stderr.flush()
-            return
+            return False
 
         with print_lock:
             print(
@@ -197,33 +284,159 @@ class SerialSniffer(threading.Thread):
             )
             sys.stdout.flush()
 
+        try:
+            self._fd = self.ser.fileno()
+        except OSError:  # io.UnsupportedOperation: pyserial has no fd on Windows
+            self._fd = None
+        else:
+            os.set_blocking(self._fd, False)  # read_fd must never block the selector loop
+
+        # USB adapters (FTDI) otherwise hold bytes up to 16 ms, most of the frame gap
+        try:
+            self.ser.set_low_latency_mode(True)
+        except (AttributeError, NotImplementedError, ValueError):
+            pass  # not Linux, or a port without the setting (e.g. a pty)
+        return True
+
+    def fileno(self) -> int:
+        return self._fd
+
+    def has_fd(self) -> bool:
+        """Whether the port can be waited on with select() (not with pyserial on Windows)."""
+        return self._fd is not None
+
+    def read(self) -> bytes:
+        """Whatever the port has buffered, blocking for one byte if nothing is."""
+        return self.ser.read(self.ser.in_waiting or 1)
+
+    def read_fd(self) -> bytes:
+        """Whatever the port has buffered, read from its fd without going through pyserial."""
+        try:
+            b = os.read(self._fd, READ_CHUNK)
+        except BlockingIOError:
+            return b""
+        if not b:
+            # Same condition pyserial reports, e.g. the adapter was unplugged
+            raise serial.SerialException("device reports readiness to read but returned no data")
+        return b
+
+    def feed(self, b: bytes, now: float):
+        """Add bytes seen at monotonic time now to the pending frame."""
+        if b:
+            self._buf.extend(b)
+            self._last_byte_ts = now
+
+    def deadline(self) -> Optional[float]:
+        """Monotonic time at which the pending frame ends, or None without one."""
+        if self._buf:
+            return self._last_byte_ts + self.frame_timeout_s
+        return None
+
+    def flush_if_idle(self, now: float):
+        if self._buf and (now - self._last_byte_ts) >= self.frame_timeout_s:
+            # Flush a frame after inactivity
+            self.flush()
+
+    def flush(self):
+        if self._buf:
+            ts_wall = time.time()
+            # print_frame copies what it keeps, so the buffer is reused right away
+            self.printer.print_frame(self.label, self.is_tx, ts_wall, self._buf)
+            self._buf.clear()
+
+    def close(self):
+        # Flush any remaining buffered data on shutdown
+        self.flush()
+        try:
+            self.ser.close()
+        except Exception:
+            pass
+
+    def poll(self):
+        """Capture loop for a port select() cannot wait on (pyserial has no fd on Windows)."""
         try:
             while not stop_event.is_set():
-                b = ser.read(1)
+                b = self.read()
                 now = time.monotonic()
-                if b:
-                    if not self._buf:
-                        self._last_byte_ts = now
-                    self._buf.extend(b)
-                    self._last_byte_ts = now
-                else:
-                    if self._buf and (now - self._last_byte_ts) >= self.frame_timeout_s:
-                        # Flush a frame after inactivity
-                        ts_wall = time.time()
-                        data = bytes(self._buf)
-                        self._buf.clear()
-                        self.printer.print_frame(self.label, self.is_tx, ts_wall, data)
+                self.feed(b, now)
+                self.flush_if_idle(now)
         finally:
-            # Flush any remaining buffered data on shutdown
-            if self._buf:
-                ts_wall = time.time()
-                data = bytes(self._buf)
-                self._buf.clear()
-                self.printer.print_frame(self.label, self.is_tx, ts_wall, data)
-            try:
-                ser.close()
-            except Exception:
-                pass
+            self.close()
+
+
+def run_selector(sniffers: list[SerialSniffer]):
+    """Capture all ports from one thread.
+
+    The single wait ends when any port has data or when the earliest pending
+    frame's inactivity gap runs out.
+    """
+    with selectors.DefaultSelector() as sel:
+        for sniffer in sniffers:
+            sel.register(sniffer, selectors.EVENT_READ)
+        now = time.monotonic()
+        try:
+            while sniffers and not stop_event.is_set():
+                wait = IDLE_WAIT_S
+                for deadline in filter(None, (s.deadline() for s in sniffers)):
+                    wait = min(wait, max(0.0, deadline - now))
+                events = sel.select(wait)
+                # One timestamp per wakeup: bytes read now are well inside the gap tolerance
+                now = time.monotonic()
+                for key, _ in events:
+                    sniffer = key.fileobj
+                    try:
+                        sniffer.feed(sniffer.read_fd(), now)
+                    except OSError as e:  # includes serial.SerialException
+                        with print_lock:
+                            print(f"{Ansi.ERR}Lost {sniffer.port}: {e}{Ansi.RESET}", file=sys.stderr)
+                            sys.stderr.flush()
+                        sel.unregister(sniffer)
+                        sniffers.remove(sniffer)
+                        sniffer.close()
+                for sniffer in sniffers:
+                    sniffer.flush_if_idle(now)
+        finally:
+            for sniffer in sniffers:
+                sniffer.close()
+
+
+def run_threads(sniffers: list[SerialSniffer]):
+    """Capture each port on its own thread; used where ports have no fd to select on."""
+    threads = [threading.Thread(target=s.poll, daemon=True) for s in sniffers]
+    for thread in threads:
+        thread.start()
+
+    try:
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        stop_event.set()
+
+    for thread in threads:
+        thread.join(timeout=1.0)
+
+
+def tune_scheduling(cpu: Optional[int], realtime: bool):
+    """Pin the calling thread to one CPU and/or give it real-time priority (Linux).
+
+    Threads started afterwards inherit the settings; the frame printer thread,
+    started earlier, keeps the defaults.
+    """
+    def warn(msg: str):
+        with print_lock:
+            print(f"{Ansi.WARN}{msg}{Ansi.RESET}", file=sys.stderr)
+            sys.stderr.flush()
+
+    if cpu is not None:
+        try:
+            os.sched_setaffinity(0, {cpu})
+        except (AttributeError, OSError) as e:
+            warn(f"Could not pin capture to CPU {cpu}: {e}")
+    if realtime:
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(REALTIME_PRIORITY))
+        except (AttributeError, OSError) as e:
+            warn(f"Could not switch capture to real-time scheduling (needs root or CAP_SYS_NICE): {e}")
 
 
 def parse_args(argv: list[str]) -> argparse.Namespace:
@@ -241,6 +454,13 @@ def parse_args(argv: list[str]) -> argparse.Namespace:
         default=20.0,
         help="Frame inactivity timeout in milliseconds for separating frames (default: 20)",
     )
+    p.add_argument("--cpu", dest="cpu", type=int, default=None, help="Pin the capture loop to this CPU (Linux only)")
+    p.add_argument(
+        "--realtime",
+        dest="realtime",
+        action="store_true",
+        help="Run the capture loop with SCHED_FIFO priority so gap timing survives system load (Linux, needs root)",
+    )
     return p.parse_args(argv)
 
 
@@ -284,18 +504,16 @@ def main(argv: list[str]) -> int:
     signal.signal(signal.SIGINT, handle_sigint)
     signal.signal(signal.SIGTERM, handle_sigint)
 
-    # Start both threads
-    tx_sniffer.start()
-    rx_sniffer.start()
-
+    # One thread waits on both ports where they have file descriptors (POSIX)
+    sniffers = [s for s in (tx_sniffer, rx_sniffer) if s.open()]
+    tune_scheduling(args.cpu, args.realtime)
     try:
-        while tx_sniffer.is_alive() or rx_sniffer.is_alive():
-            time.sleep(0.2)
-    except KeyboardInterrupt:
-        stop_event.set()
-
-    tx_sniffer.join(timeout=1.0)
-    rx_sniffer.join(timeout=1.0)
+        if all(s.has_fd() for s in sniffers):
+            run_selector(sniffers)
+        else:
+            run_threads(sniffers)
+    finally:
+        printer.close()
 
     return 0
 
@@ -7,11 +7,8 @@ import sys
 import platform
 import subprocess
 
-# Check if tkinter is available
-try:
-    import tkinter as tk
-    from tkinter import ttk, filedialog, messagebox
-except ImportError:
+def _print_tk_install_help():
+    """Print how to install tkinter on this OS."""
     print("=" * 70)
     print("ERROR: tkinter is not installed")
     print("=" * 70)
@@ -70,56 +67,87 @@ except ImportError:
     
     print("\nAfter installation, run this script again.")
     print("=" * 70)
+
+# Check if tkinter is available
+try:
+    import tkinter as tk
+    from tkinter import ttk, filedialog, messagebox
+except ImportError:
+    if __name__ != "__main__":
+        raise  # imported as a module: let the caller handle it
+    _print_tk_install_help()
     sys.exit(1)
 
+import asyncio
 import socket
 import ipaddress
-import urllib.request
-import urllib.error
 import json
 import threading
 import os
+import queue
+import re
+import time
 import http.client
 from typing import List, Optional, Dict, Callable
 
+# Hosts probed at once during a network scan
+SCAN_CONCURRENCY = 512
+
+# TCP connect timeout for the scan probe; hosts without a listener are dropped after this
+# (same value as TCP_PROBE_TIMEOUT in find_openevse.py)
+TCP_CONNECT_TIMEOUT = 0.3
+
+# Timeout for the HEAD response once a scanned host accepted the connection
+HEAD_TIMEOUT = 2
+
+# The "hostname" field of /config; matching it saves parsing the whole (several KB) config
+_HOSTNAME_RE = re.compile(rb'"hostname"\s*:\s*"([^"\\]+)"')
+
+# Multipart boundary for firmware uploads; random (once per process) so no firmware image will contain it
+UPLOAD_BOUNDARY = '----WebKitFormBoundary' + os.urandom(16).hex()
+
+# Multipart envelope around the streamed firmware; only the filename varies per upload
+_MP_PREAMBLE_TMPL = (
+    f'--{UPLOAD_BOUNDARY}\r\n'
+    'Content-Disposition: form-data; name="file"; filename="%s"\r\n'
+    'Content-Type: application/octet-stream\r\n'
+    '\r\n'
+).encode()
+_MP_TRAILER = f'\r\n--{UPLOAD_BOUNDARY}--\r\n'.encode()
+
+# Milliseconds between drains of the UI queue, and updates applied per drain
+UI_POLL_MS = 50
+UI_BATCH_MAX = 64
+
 class ProgressHTTPConnection(http.client.HTTPConnection):
-    """HTTP connection that reports upload progress."""
+    """HTTP connection that streams a file body and reports upload progress."""
+    
+    # Seconds between progress reports; each one costs a Tk update on the main thread
+    PROGRESS_INTERVAL = 0.05
     
     def __init__(self, *args, **kwargs):
         self.progress_callback = kwargs.pop('progress_callback', None)
         super().__init__(*args, **kwargs)
     
-    def send(self, data):
-        """Override send to track progress."""
-        if self.progress_callback and hasattr(data, '__len__'):
-            total_size = len(data)
-            chunk_size = 8192  # 8KB chunks
-            sent = 0
-            
-            # Convert data to bytes if it's a string
-            if isinstance(data, str):
-                data = data.encode('iso-8859-1')
-            
-            while sent < total_size:
-                chunk = data[sent:sent + chunk_size]
-                super().send(chunk)
-                sent += len(chunk)
-                self.progress_callback(sent, total_size)
-        else:
-            super().send(data)
-
-class ProgressHTTPHandler(urllib.request.HTTPHandler):
-    """HTTP handler that uses ProgressHTTPConnection."""
-    
-    def __init__(self, progress_callback: Optional[Callable] = None):
-        super().__init__()
-        self.progress_callback = progress_callback
-    
-    def http_open(self, req):
-        return self.do_open(self._get_connection, req)
-    
-    def _get_connection(self, host, timeout=None):
-        return ProgressHTTPConnection(host, timeout=timeout, progress_callback=self.progress_callback)
+    def send_file(self, f, size: int):
+        """Send size bytes from the open file f, straight from disk in chunks.
+        
+        socket.sendfile lets the kernel copy file pages to the socket (sendfile(2))
+        and falls back to plain sends where that is not available.
+        """
+        chunk_size = 65536  # 64KB per sendfile call; smaller calls cost more in setup than they save
+        offset = f.tell()
+        sent = 0
+        last_report = 0.0
+        while sent < size:
+            count = self.sock.sendfile(f, offset + sent, min(chunk_size, size - sent))
+            if not count:
+                raise EOFError(f"{os.path.basename(f.name)} ended after {sent:,} of {size:,} bytes")
+            sent += count
+            now = time.monotonic()
+            if self.progress_callback and (sent == size or now - last_report >= self.PROGRESS_INTERVAL):
+                last_report = now
+                self.progress_callback(sent, size)
 
 class OpenEVSEUploader:
     def __init__(self, root):
@@ -131,6 +159,8 @@ class OpenEVSEUploader:
         self.target_ip = tk.StringVar()
         self.found_devices = []
         self.scanning = False
+        # Worker threads queue Tk calls here; only poll_ui_queue runs them, on the main thread
+        self.ui_queue = queue.SimpleQueue()
         
         self.create_widgets()
         
@@ -141,6 +171,33 @@ class OpenEVSEUploader:
         self.root.geometry(f"{width}x{height}")
         self.root.minsize(width, height)
         
+        self.root.after(UI_POLL_MS, self.poll_ui_queue)
+    
+    def run_on_ui(self, func: Callable, *args, **kwargs):
+        """Queue func(*args, **kwargs) to run on the Tk main thread."""
+        self.ui_queue.put((func, args, kwargs))
+    
+    def poll_ui_queue(self):
+        """Apply updates queued by worker threads, at most UI_BATCH_MAX per tick."""
+        # Re-armed first so a modal dialog opened by an update does not stall the queue
+        self.root.after(UI_POLL_MS, self.poll_ui_queue)
+        # Devices found in a row go into the listbox with one insert (one relayout)
+        rows = []
+        for _ in range(UI_BATCH_MAX):
+            try:
+                func, args, kwargs = self.ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            if func == self.device_listbox.insert and args[0] == tk.END and not kwargs:
+                rows.extend(args[1:])
+                continue
+            if rows:
+                self.device_listbox.insert(tk.END, *rows)
+                rows = []
+            func(*args, **kwargs)
+        if rows:
+            self.device_listbox.insert(tk.END, *rows)
+        
     def create_widgets(self):
         # Main container
         main_frame = ttk.Frame(self.root, padding="10")
@@ -251,19 +308,32 @@ class OpenEVSEUploader:
         except Exception:
             return None
             
-    def get_hostname(self, ip: str) -> str:
-        """Get hostname from OpenEVSE device config API."""
+    def get_hostname(self, ip: str, conn: Optional[http.client.HTTPConnection] = None) -> str:
+        """Get hostname from OpenEVSE device config API.
+        
+        When conn is given (the keep-alive connection check_host probed with),
+        /config is fetched over it instead of a new connection.
+        """
+        own_conn = conn is None
+        if own_conn:
+            conn = http.client.HTTPConnection(ip, 80, timeout=2)
         try:
-            url = f"http://{ip}/config"
-            req = urllib.request.Request(url, method='GET')
-            with urllib.request.urlopen(req, timeout=2) as response:
-                if response.status == 200:
-                    data = json.loads(response.read().decode())
-                    hostname = data.get('hostname') or data.get('device_name') or data.get('name')
-                    if hostname:
-                        return hostname
+            conn.request('GET', '/config')
+            response = conn.getresponse()
+            body = response.read()
+            if response.status == 200:
+                match = _HOSTNAME_RE.search(body)
+                if match:
+                    return match.group(1).decode()
+                data = json.loads(body.decode())
+                hostname = data.get('hostname') or data.get('device_name') or data.get('name')
+                if hostname:
+                    return hostname
         except Exception:
             pass
+        finally:
+            if own_conn:
+                conn.close()
         
         try:
             hostname, _, _ = socket.gethostbyaddr(ip)
@@ -273,89 +343,110 @@ class OpenEVSEUploader:
     
     def check_host(self, ip: str) -> Optional[Dict]:
         """Check if a host has Mongoose server on port 80."""
+        conn = http.client.HTTPConnection(ip, 80, timeout=2)
         try:
-            url = f"http://{ip}"
-            req = urllib.request.Request(url, method='HEAD')
-            with urllib.request.urlopen(req, timeout=2) as response:
-                server_header = response.headers.get('Server', '')
-                
-                if 'Mongoose' in server_header:
-                    hostname = self.get_hostname(ip)
-                    return {
-                        'ip': ip,
-                        'hostname': hostname,
-                        'server': server_header
-                    }
+            conn.request('HEAD', '/')
+            response = conn.getresponse()
+            response.read()
+            server_header = response.getheader('Server', '')
+            
+            if response.status < 400 and 'Mongoose' in server_header:
+                # Same connection for /config; http.client reconnects if the device closed it
+                hostname = self.get_hostname(ip, conn)
+                return {
+                    'ip': ip,
+                    'hostname': hostname,
+                    'server': server_header
+                }
         except Exception:
             pass
+        finally:
+            conn.close()
         
         return None
     
+    async def probe_server(self, ip: str) -> Optional[str]:
+        """Send a raw HEAD request to ip:80 and return its Server header.
+        
+        Two stages: a bare TCP connect with the short connect timeout, so the
+        many addresses without a listener cost one handshake attempt, then the
+        HEAD exchange on that same connection for the few that accepted.
+        Returns None when nothing listens, the answer is not HTTP, or the status
+        is an error (as check_host rejects it too).
+        """
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, 80), TCP_CONNECT_TIMEOUT)
+        except (OSError, asyncio.TimeoutError):
+            return None
+        try:
+            writer.write(b'HEAD / HTTP/1.0\r\nHost: ' + ip.encode() + b'\r\n\r\n')
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), HEAD_TIMEOUT)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            return None
+        finally:
+            writer.close()
+        
+        status_line, *header_lines = head.split(b'\r\n')
+        parts = status_line.split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith(b'HTTP/') or not parts[1].isdigit() or int(parts[1]) >= 400:
+            return None
+        for line in header_lines:
+            name, _, value = line.partition(b':')
+            if name.strip().lower() == b'server':
+                return value.strip().decode('latin-1')
+        return ''
+    
+    async def scan_hosts(self, hosts: List[str]):
+        """Probe all hosts concurrently, listing OpenEVSE devices as they answer."""
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(SCAN_CONCURRENCY)
+        checked = 0
+        
+        async def check_and_update(ip_str):
+            nonlocal checked
+            if not self.scanning:
+                return
+            
+            async with semaphore:
+                server_header = await self.probe_server(ip_str)
+            
+            if server_header and 'Mongoose' in server_header:
+                # get_hostname blocks (HTTP, reverse DNS); keep it off the event loop
+                hostname = await loop.run_in_executor(None, self.get_hostname, ip_str)
+                result = {
+                    'ip': ip_str,
+                    'hostname': hostname,
+                    'server': server_header
+                }
+                self.found_devices.append(result)
+                display_text = f"{result['ip']} - {result['hostname']}"
+                self.run_on_ui(self.device_listbox.insert, tk.END, display_text)
+            
+            checked += 1
+            if checked % 25 == 0 or checked == len(hosts):
+                self.run_on_ui(self.scan_status.config, text=f"Scanning... {checked}/{len(hosts)} hosts checked")
+        
+        await asyncio.gather(*(check_and_update(ip) for ip in hosts))
+    
     def scan_network_thread(self):
-        """Scan network for OpenEVSE devices using parallel threads."""
+        """Scan network for OpenEVSE devices with concurrent probes on an event loop."""
         self.scanning = True
         self.found_devices = []
         
         network = self.get_local_network()
         if not network:
-            self.root.after(0, lambda: self.scan_status.config(
-                text="Error: Could not detect network"))
+            self.run_on_ui(self.scan_status.config, text="Error: Could not detect network")
             self.scanning = False
-            self.root.after(0, lambda: self.scan_button.config(state='normal'))
+            self.run_on_ui(self.scan_button.config, state='normal')
             return
         
-        self.root.after(0, lambda: self.scan_status.config(
-            text=f"Scanning {network}..."))
-        
-        hosts = list(network.hosts())
-        checked = [0]  # Use list to make it mutable in nested function
-        lock = threading.Lock()
-        
-        def check_and_update(ip_str):
-            if not self.scanning:
-                return
-            
-            result = self.check_host(ip_str)
-            
-            with lock:
-                checked[0] += 1
-                current = checked[0]
-                
-                if result:
-                    self.found_devices.append(result)
-                    display_text = f"{result['ip']} - {result['hostname']}"
-                    self.root.after(0, lambda t=display_text: self.device_listbox.insert(tk.END, t))
-                
-                if current % 25 == 0 or current == len(hosts):
-                    self.root.after(0, lambda c=current, t=len(hosts): 
-                        self.scan_status.config(text=f"Scanning... {c}/{t} hosts checked"))
+        self.run_on_ui(self.scan_status.config, text=f"Scanning {network}...")
         
-        # Use thread pool for parallel scanning
-        max_workers = 50
-        threads = []
+        asyncio.run(self.scan_hosts([str(ip) for ip in network.hosts()]))
         
-        for ip in hosts:
-            if not self.scanning:
-                break
-            
-            thread = threading.Thread(target=check_and_update, args=(str(ip),), daemon=True)
-            thread.start()
-            threads.append(thread)
-            
-            # Limit concurrent threads
-            if len(threads) >= max_workers:
-                threads[0].join()
-                threads.pop(0)
-        
-        # Wait for remaining threads
-        for thread in threads:
-            thread.join()
-        
-        count = len(self.found_devices)
-        self.root.after(0, lambda: self.scan_status.config(
-            text=f"Scan complete: Found {count} device(s)"))
+        self.run_on_ui(self.scan_status.config, text=f"Scan complete: Found {len(self.found_devices)} device(s)")
         self.scanning = False
-        self.root.after(0, lambda: self.scan_button.config(state='normal'))
+        self.run_on_ui(self.scan_button.config, state='normal')
     
     def start_scan(self):
         """Start network scan in background thread."""
@@ -399,24 +490,24 @@ class OpenEVSEUploader:
             result = self.check_host(target)
             
             if result:
-                self.root.after(0, lambda: messagebox.showinfo("Device Found", 
+                self.run_on_ui(messagebox.showinfo, "Device Found", 
                     f"OpenEVSE device verified!\n\n"
                     f"IP: {result['ip']}\n"
                     f"Hostname: {result['hostname']}\n"
                     f"Server: {result['server']}\n\n"
-                    f"Ready to upload firmware."))
-                self.root.after(0, lambda: self.status_label.config(
-                    text=f"✓ Device verified: {result['hostname']}", foreground="green"))
+                    f"Ready to upload firmware.")
+                self.run_on_ui(self.status_label.config, 
+                    text=f"✓ Device verified: {result['hostname']}", foreground="green")
             else:
-                self.root.after(0, lambda: messagebox.showwarning("Device Not Found", 
+                self.run_on_ui(messagebox.showwarning, "Device Not Found", 
                     f"Could not find OpenEVSE device at {target}\n\n"
                     f"Please check:\n"
                     f"- The address is correct\n"
                     f"- The device is powered on\n"
                     f"- You are on the same network\n\n"
-                    f"You can still try uploading anyway."))
-                self.root.after(0, lambda: self.status_label.config(
-                    text=f"⚠ Could not verify device at {target}", foreground="orange"))
+                    f"You can still try uploading anyway.")
+                self.run_on_ui(self.status_label.config, 
+                    text=f"⚠ Could not verify device at {target}", foreground="orange")
         
         thread = threading.Thread(target=verify_thread, daemon=True)
         thread.start()
@@ -424,67 +515,56 @@ class OpenEVSEUploader:
     def upload_firmware_thread(self, firmware_path: str, target: str):
         """Upload firmware in background thread."""
         try:
-            # Read firmware file
+            # The firmware is streamed from disk; only the multipart envelope is built in memory
             with open(firmware_path, 'rb') as f:
-                firmware_data = f.read()
-            
-            file_size = len(firmware_data)
-            filename = os.path.basename(firmware_path)
-            
-            self.root.after(0, lambda: self.status_label.config(
-                text=f"Uploading {filename} ({file_size:,} bytes)...", foreground="blue"))
-            
-            # Prepare multipart form data
-            boundary = '----WebKitFormBoundary' + os.urandom(16).hex()
-            
-            body = []
-            body.append(f'--{boundary}'.encode())
-            body.append(f'Content-Disposition: form-data; name="file"; filename="{filename}"'.encode())
-            body.append(b'Content-Type: application/octet-stream')
-            body.append(b'')
-            body.append(firmware_data)
-            body.append(f'--{boundary}--'.encode())
-            body.append(b'')
-            
-            body_bytes = b'\r\n'.join(body)
-            total_size = len(body_bytes)
-            
-            # Progress callback to update the progress bar
-            def update_progress(sent: int, total: int):
-                percent = int((sent / total) * 100)
-                def set_progress():
-                    self.progress['value'] = percent
-                    self.status_label.config(
-                        text=f"Uploading {filename}: {percent}% ({sent:,}/{total:,} bytes)", 
-                        foreground="blue")
-                self.root.after(0, set_progress)
-            
-            # Upload firmware with progress tracking
-            url = f"http://{target}/update"
-            req = urllib.request.Request(url, data=body_bytes, method='POST')
-            req.add_header('Content-Type', f'multipart/form-data; boundary={boundary}')
-            req.add_header('Content-Length', str(total_size))
-            
-            # Create opener with progress handler
-            opener = urllib.request.build_opener(ProgressHTTPHandler(progress_callback=update_progress))
-            
-            with opener.open(req, timeout=120) as response:
-                result = response.read().decode()
+                file_size = os.fstat(f.fileno()).st_size
+                filename = os.path.basename(firmware_path)
+                
+                self.run_on_ui(self.status_label.config, 
+                    text=f"Uploading {filename} ({file_size:,} bytes)...", foreground="blue")
+                
+                # Prepare multipart form data
+                preamble = _MP_PREAMBLE_TMPL % filename.encode()
+                total_size = len(preamble) + file_size + len(_MP_TRAILER)
                 
-                if response.status == 200:
-                    self.root.after(0, lambda: self.show_success(target))
-                else:
-                    self.root.after(0, lambda: self.show_error(
-                        f"Upload failed with status {response.status}"))
-        
-        except urllib.error.URLError as e:
-            self.root.after(0, lambda: self.show_error(f"Network error: {e.reason}"))
+                # Progress callback to update the progress bar
+                def update_progress(sent: int, total: int):
+                    percent = int((sent / total) * 100)
+                    def set_progress():
+                        self.progress['value'] = percent
+                        self.status_label.config(
+                            text=f"Uploading {filename}: {percent}% ({sent:,}/{total:,} bytes)", 
+                            foreground="blue")
+                    self.run_on_ui(set_progress)
+                
+                # Upload firmware with progress tracking
+                conn = ProgressHTTPConnection(target, timeout=120, progress_callback=update_progress)
+                try:
+                    conn.putrequest('POST', '/update')
+                    conn.putheader('Content-Type', f'multipart/form-data; boundary={UPLOAD_BOUNDARY}')
+                    conn.putheader('Content-Length', str(total_size))
+                    conn.endheaders(preamble)
+                    conn.send_file(f, file_size)
+                    conn.send(_MP_TRAILER)
+                    
+                    response = conn.getresponse()
+                    response.read()
+                finally:
+                    conn.close()
+            
+            if response.status == 200:
+                self.run_on_ui(self.show_success, target)
+            else:
+                self.run_on_ui(self.show_error, f"Upload failed with status {response.status}")
+        
         except FileNotFoundError:
-            self.root.after(0, lambda: self.show_error("Firmware file not found"))
+            self.run_on_ui(self.show_error, "Firmware file not found")
+        except (OSError, http.client.HTTPException) as e:
+            self.run_on_ui(self.show_error, f"Network error: {e}")
         except Exception as e:
-            self.root.after(0, lambda: self.show_error(f"Error: {str(e)}"))
+            self.run_on_ui(self.show_error, f"Error: {str(e)}")
         finally:
-            self.root.after(0, self.upload_complete)
+            self.run_on_ui(self.upload_complete)
     
     def show_success(self, target: str):
         """Show success message."""
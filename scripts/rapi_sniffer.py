@@ -6,45 +6,198 @@ Sniffs RAPI protocol communication from two serial ports (RX and TX) and prints
 
 Usage:
     python3 rapi_sniffer.py --rx /dev/ttyUSB0 --tx /dev/ttyUSB1 --baud 115200
+    python3 rapi_sniffer.py --rx /dev/ttyUSB0 --verify-checksum
 """
 import sys
 import argparse
+import functools
+import os
+import queue
+import re
+import selectors
 import serial
+import threading
 import time
+import traceback
+
+# One RAPI frame: '$', anything but '^', '^' (a stray '$' inside stays part of the frame)
+_FRAME_RE = re.compile(rb'\$[^^]*\^')
+# The same, plus the optional two hex digits of RAPI's XOR checksum after the '^'
+_FRAME_CHECKSUM_RE = re.compile(rb'(\$[^^]*\^)([0-9A-Fa-f]{2})?')
+
+# Bytes read per syscall once select() reports a port readable
+READ_CHUNK = 4096
+
+# A partial frame longer than this lost its '^' (RAPI lines are far shorter) and is dropped
+MAX_FRAME = 1024
+
+# Longest wait between attempts to reopen the ports after a serial error
+MAX_RETRY_S = 5.0
 
 def parse_rapi_line(line):
-    """Parse a RAPI line and return command and arguments."""
-    if not line.startswith(b'$') or not line.endswith(b'^'):
+    """Parse a RAPI line and return command and arguments (as bytes)."""
+    if not line or line[0] != 0x24 or line[-1] != 0x5E:  # b'$', b'^'
         return None
+    # Remove $ and ^
+    cmd, *args = line[1:-1].split(b' ')
+    return cmd, args
+
+def _text(b):
+    """RAPI bytes as printable text."""
+    return b.decode('ascii', errors='replace')
+
+@functools.lru_cache(maxsize=256)
+def _cmd_text(cmd):
+    """_text for command names, which repeat from a small set."""
+    return _text(cmd)
+
+def rapi_checksum(line):
+    """RAPI's checksum of a $...^ frame: the XOR of every byte before the '^'."""
+    checksum = 0
+    for b in line[:-1]:
+        checksum ^= b
+    return checksum
+
+def drain_frames(buf, new, checksum=False):
+    """Remove complete $...^ frames from the front of buf (a bytearray) and return them.
+
+    new is how many bytes were appended to buf since the last call. What stays
+    in buf is the partial frame to keep buffering (it never holds a '^'), so
+    only the new bytes are searched for a terminator. Bytes outside a frame
+    are dropped, as are stray '^' with no '$' before them.
+
+    With checksum, frames come as (frame, checksum digits or b'') and a frame
+    is held back until the two bytes after its '^' have arrived.
+    """
+    frames = []
+    hold = 2 if checksum else 0
+    end = buf.rfind(b'^', max(0, len(buf) - new - hold), max(0, len(buf) - hold)) + 1
+    if checksum and end:
+        # The digits may run past end; a frame whose '^' is in the held-back bytes waits
+        frames = [m.groups(b'') for m in _FRAME_CHECKSUM_RE.finditer(buf, 0, end + hold) if m.end(1) <= end]
+    elif end:
+        frames = _FRAME_RE.findall(buf, 0, end)
+    start = buf.find(b'$', end)
+    del buf[:start if start != -1 else len(buf)]
+    return frames
+
+def checksum_note(line, digits):
+    """How the checksum digits sent after line compare with its RAPI checksum."""
+    if not digits:
+        return " (no checksum)"
+    expected = rapi_checksum(line)
+    if int(digits, 16) == expected:
+        return " (checksum OK)"
+    return f" (checksum BAD: got {_text(digits).upper()}, expected {expected:02X})"
+
+def print_frames(label, frames, checksum=False):
+    """Print each frame read from the port labelled label (RX/TX); the caller flushes stdout.
+
+    With checksum, frames are (frame, digits) pairs from drain_frames and each
+    line ends with the result of checking them.
+    """
+    if not frames:
+        return
+    out = []
+    for line in frames:
+        note = ""
+        if checksum:
+            line, digits = line
+            note = checksum_note(line, digits)
+        result = parse_rapi_line(line)
+        if result:
+            cmd, args_ = result
+            out.append(f"{label} -> RAPI Command: {_cmd_text(cmd)} Args: {[_text(a) for a in args_]}{note}\n")
+        else:
+            out.append(f"{label} -> Malformed RAPI: {line}{note}\n")
+    sys.stdout.write(''.join(out))
+
+def process_stream(label, buf, data, checksum=False):
+    """Append data read from the port labelled label to its buffer and print the frames it completes."""
+    buf.extend(data)
+    print_frames(label, drain_frames(buf, len(data), checksum), checksum)
+    if len(buf) > MAX_FRAME:
+        print(f"{label} -> Overflow, frame dropped: {bytes(buf[:32])}...")
+        buf.clear()
+
+def has_fd(ser):
+    """Whether ser can be waited on with select() (not with pyserial on Windows)."""
     try:
-        # Remove $ and ^
-        payload = line[1:-1].decode('ascii', errors='replace')
-        parts = payload.split(' ')
-        cmd = parts[0]
-        args = parts[1:]
-        return cmd, args
-    except Exception as e:
+        ser.fileno()
+    except OSError:  # io.UnsupportedOperation
+        return False
+    return True
+
+def read_fd(ser):
+    """Whatever ser has buffered, read from its fd without going through pyserial."""
+    try:
+        data = os.read(ser.fileno(), READ_CHUNK)
+    except BlockingIOError:
+        return b''
+    if not data:
+        # Same condition pyserial reports, e.g. the adapter was unplugged
+        raise serial.SerialException("device reports readiness to read but returned no data")
+    return data
+
+def open_ports(args):
+    """Open the requested ports as a list of (label, serial.Serial)."""
+    ports = []
+    try:
+        for label, port in (('RX', args.rx), ('TX', args.tx)):
+            if port:
+                ports.append((label, serial.Serial(port, args.baud, timeout=0.1)))
+    except Exception:
+        close_ports(ports)
+        raise
+    return ports
+
+def close_ports(ports):
+    for _, ser in ports:
+        ser.close()
+
+def make_selector(ports):
+    """A selector with all ports registered, or None if one has no select()-able fd."""
+    if not all(has_fd(ser) for _, ser in ports):
         return None
+    sel = selectors.DefaultSelector()
+    for label, ser in ports:
+        os.set_blocking(ser.fileno(), False)  # read_fd must never block the loop
+        sel.register(ser, selectors.EVENT_READ, label)
+    return sel
+
+def read_port(label, ser, chunks):
+    """Queue (label, data) for everything read from ser; on failure queue (label, error) and stop."""
+    while True:
+        try:
+            data = ser.read(ser.in_waiting or 1)
+        except Exception as e:
+            chunks.put((label, e))
+            return
+        if data:
+            chunks.put((label, data))
+
+def start_readers(ports):
+    """Start a reader thread per port; returns the queue they feed."""
+    chunks = queue.SimpleQueue()
+    for label, ser in ports:
+        threading.Thread(target=read_port, args=(label, ser, chunks), daemon=True).start()
+    return chunks
 
 def main():
     parser = argparse.ArgumentParser(description='RAPI protocol sniffer (RX/TX)')
     parser.add_argument('--rx', help='RX serial port (e.g. /dev/ttyUSB0)')
     parser.add_argument('--tx', help='TX serial port (e.g. /dev/ttyUSB1)')
     parser.add_argument('--baud', type=int, default=115200, help='Baud rate (default: 115200)')
+    parser.add_argument('--verify-checksum', action='store_true',
+                        help="Check the XOR checksum (^XX) after each frame")
     args = parser.parse_args()
 
     if not args.rx and not args.tx:
         print("Error: At least one of --rx or --tx must be specified", flush=True)
         sys.exit(1)
 
-    ser_rx = None
-    ser_tx = None
-    
     try:
-        if args.rx:
-            ser_rx = serial.Serial(args.rx, args.baud, timeout=0.1)
-        if args.tx:
-            ser_tx = serial.Serial(args.tx, args.baud, timeout=0.1)
+        ports = open_ports(args)
     except Exception as e:
         print(f"Error opening serial ports: {e}", flush=True)
         sys.exit(1)
@@ -56,50 +209,59 @@ def main():
         ports_str.append(f"TX: {args.tx}")
     print(f"Listening on {', '.join(ports_str)} at {args.baud} baud...", flush=True)
 
-    buffer_rx = b''
-    buffer_tx = b''
-    while True:
-        try:
-            data_rx = ser_rx.read(256) if ser_rx else b''
-            data_tx = ser_tx.read(256) if ser_tx else b''
-            if data_rx:
-                buffer_rx += data_rx
-                while b'$' in buffer_rx and b'^' in buffer_rx:
-                    start = buffer_rx.find(b'$')
-                    end = buffer_rx.find(b'^', start)
-                    if end == -1:
-                        break
-                    line = buffer_rx[start:end+1]
-                    buffer_rx = buffer_rx[end+1:]
-                    result = parse_rapi_line(line)
-                    if result:
-                        cmd, args_ = result
-                        print(f"RX -> RAPI Command: {cmd} Args: {args_}", flush=True)
-                    else:
-                        print(f"RX -> Malformed RAPI: {line}", flush=True)
-            if data_tx:
-                buffer_tx += data_tx
-                while b'$' in buffer_tx and b'^' in buffer_tx:
-                    start = buffer_tx.find(b'$')
-                    end = buffer_tx.find(b'^', start)
-                    if end == -1:
-                        break
-                    line = buffer_tx[start:end+1]
-                    buffer_tx = buffer_tx[end+1:]
-                    result = parse_rapi_line(line)
-                    if result:
-                        cmd, args_ = result
-                        print(f"TX -> RAPI Command: {cmd} Args: {args_}", flush=True)
-                    else:
-                        print(f"TX -> Malformed RAPI: {line}", flush=True)
-            if not data_rx and not data_tx:
-                time.sleep(0.01)
-        except KeyboardInterrupt:
-            print("Exiting...", flush=True)
-            break
-        except Exception as e:
-            print(f"Error: {e}", flush=True)
-            time.sleep(0.5)
+    # Frames are flushed once per wakeup, so a burst costs one write even on a terminal
+    sys.stdout.reconfigure(line_buffering=False)
+    buffers = {label: bytearray() for label, _ in ports}
+    # Block until a port has data instead of polling both with read timeouts; without
+    # select()-able fds (pyserial on Windows) a thread per port blocks in read() instead
+    sel = make_selector(ports)
+    chunks = None if sel else start_readers(ports)
+    failures = 0
+    # Around the whole loop: with reader threads, Ctrl-C can land between iterations
+    try:
+        while True:
+            try:
+                if ports is None:
+                    time.sleep(min(MAX_RETRY_S, 0.1 * 2 ** failures))
+                    ports = open_ports(args)
+                    sel = make_selector(ports)
+                    chunks = None if sel else start_readers(ports)
+                    print(f"Reopened {', '.join(ports_str)}", flush=True)
+                if sel:
+                    for key, _ in sel.select(timeout=1.0):
+                        data = read_fd(key.fileobj)
+                        if data:
+                            failures = 0
+                            process_stream(key.data, buffers[key.data], data, args.verify_checksum)
+                    sys.stdout.flush()
+                else:
+                    try:
+                        label, data = chunks.get(timeout=1.0)
+                    except queue.Empty:
+                        continue
+                    if isinstance(data, Exception):
+                        raise data
+                    failures = 0
+                    process_stream(label, buffers[label], data, args.verify_checksum)
+                    sys.stdout.flush()
+            except OSError as e:  # includes serial.SerialException
+                # Port gone (e.g. adapter unplugged): close everything and reopen after a growing delay
+                print(f"Error: {e}", flush=True)
+                if sel:
+                    sel.close()
+                if ports:
+                    close_ports(ports)
+                # Readers of the closed ports fail and stop; their errors go to the dropped queue
+                ports = sel = chunks = None
+                failures = min(failures + 1, 6)
+                for buf in buffers.values():
+                    buf.clear()
+            except Exception:
+                # Not a port problem but a bug: show where it happened, then keep sniffing
+                traceback.print_exc()
+                time.sleep(0.5)
+    except KeyboardInterrupt:
+        print("Exiting...", flush=True)
 
 if __name__ == '__main__':
     main()